@@ -0,0 +1,154 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Compares the built-in ASGI app against the Starlette template, driving both in-process (no network),
+# so that only the time spent in the app and its framework is measured: websocket round trips, and file requests.
+# The apps take turns over several rounds, and the best time of each is reported. Round trips are mostly spent
+# in the session itself, which both apps share, so expect those to come out about even.
+#
+# Usage: python benchmarks/asgi.py (requires starlette)
+#
+
+import asyncio
+import os
+import tempfile
+import time
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, Response
+from starlette.routing import Mount, Route, WebSocketRoute
+from starlette.staticfiles import StaticFiles
+from h2o_nitro import AsyncView, box, asset_route, serve_asset, OverloadError
+from h2o_nitro.asgi import ASGIApp
+from h2o_nitro.core import _MsgType, _marshal
+
+n = 5000
+rounds = 5
+
+
+async def main(view: AsyncView):
+    count = 0
+    while True:
+        count = await view(box('Count', mode='number', value=count))
+
+
+nitro = AsyncView(main)
+
+
+def starlette_app(directory: str):  # as in templates/frameworks/starlette
+    async def home_page(request):
+        return FileResponse(f'{directory}/index.html')
+
+    async def asset(request):
+        status, headers, body = serve_asset(request.path_params['key'], request.headers.get('If-None-Match'))
+        return Response(body, status, headers)
+
+    async def socket(ws):
+        await ws.accept()
+        try:
+            await nitro.serve(ws.send_bytes, ws.receive_bytes)
+        except OverloadError as e:
+            await ws.close(1013, str(e.retry))
+            return
+        await ws.close()
+
+    return Starlette(routes=[
+        Mount('/static', app=StaticFiles(directory=f'{directory}/static')),
+        Route('/', home_page),
+        Route(asset_route + '{key}', asset),
+        WebSocketRoute('/nitro', socket),
+    ])
+
+
+async def round_trips(app) -> float:  # seconds per round trip: input in, page out
+    inbox = asyncio.Queue()
+    inbox.put_nowait({'type': 'websocket.connect'})
+    inbox.put_nowait({'type': 'websocket.receive', 'bytes': _marshal(dict(t=_MsgType.Join, d={}))})
+    frames = 0
+    start = 0.0
+
+    async def receive():
+        return await inbox.get()
+
+    async def send(m):
+        nonlocal frames, start
+        if m['type'] != 'websocket.send':
+            return
+        frames += 1
+        if frames == 2:  # first page, after the Set
+            start = time.perf_counter()
+        if frames > 1:
+            i = frames - 1
+            if i > n:
+                inbox.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+            else:
+                inbox.put_nowait({'type': 'websocket.receive', 'bytes': _marshal(dict(t=_MsgType.Input, d=[i]))})
+
+    scope = {'type': 'websocket', 'path': '/nitro', 'raw_path': b'/nitro', 'query_string': b'', 'headers': [],
+             'scheme': 'ws', 'server': ('127.0.0.1', 5000), 'client': ('127.0.0.1', 50000), 'root_path': ''}
+    try:
+        await app(scope, receive, send)
+    except Exception:  # starlette raises on receive_bytes() after a disconnect
+        pass
+    return (time.perf_counter() - start) / n
+
+
+async def requests(app, path: str) -> float:  # seconds per request
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+             'headers': [(b'host', b'localhost')], 'http_version': '1.1', 'scheme': 'http',
+             'server': ('127.0.0.1', 5000), 'client': ('127.0.0.1', 50000), 'root_path': ''}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(m):
+        pass
+
+    count = n // 5
+    start = time.perf_counter()
+    for _ in range(count):
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / count
+
+
+def write(path: str, size: int):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(('function f(){return 42}\n' * (size // 24 + 1))[:size])
+
+
+async def bench():
+    with tempfile.TemporaryDirectory() as directory:
+        write(f'{directory}/index.html', 2 << 10)
+        write(f'{directory}/static/js/main.js', 500 << 10)
+        apps = [('starlette', starlette_app(directory)), ('nitro', ASGIApp(nitro, directory=directory))]
+        results = {}
+        for _ in range(rounds):
+            for label, app in apps:
+                times = (
+                    await round_trips(app),
+                    await requests(app, '/'),
+                    await requests(app, '/static/js/main.js'),
+                )
+                best = results.get(label, times)
+                results[label] = tuple(map(min, best, times))
+        print(f'{"app":<12} {"round trip us":>14} {"index.html us":>14} {"main.js us":>14}')
+        for label, _ in apps:
+            print(f'{label:<12} ' + ' '.join(f'{t * 1e6:>14.1f}' for t in results[label]))
+        base, ours = results['starlette'], results['nitro']
+        print(f'{"speedup":<12} ' + ' '.join(f'{b / o:>13.1f}x' for b, o in zip(base, ours)))
+
+
+if __name__ == '__main__':
+    asyncio.run(bench())
@@ -0,0 +1,112 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Pages used by the benchmarks in this directory.
+#
+# docs_pages() runs every example in ../docs against a recording view, and collects the first page each example
+# renders. large_pages() builds synthetic pages in the thousands of boxes.
+#
+
+import importlib.util
+import inspect
+from pathlib import Path
+from typing import List, Tuple
+from h2o_nitro import Box, box, row, col, option
+
+docs_dir = Path(__file__).parent.parent / 'docs'
+
+
+class _Stop(Exception):
+    pass
+
+
+class _Recorder:
+    def __init__(self):
+        self.pages: List[Box] = []
+        self.context = {}
+
+    def __call__(self, *items, read=True, **kwargs):
+        kwargs.pop('overwrite', None)
+        kwargs.pop('position', None)
+        self.pages.append(Box(items=items, **kwargs))
+        raise _Stop()
+
+    def set(self, **kwargs):
+        pass
+
+    def __getitem__(self, key):
+        return self.context.get(key)
+
+    def __setitem__(self, key, value):
+        self.context[key] = value
+
+
+def docs_pages() -> List[Tuple[str, Box]]:
+    pages = []
+    for path in sorted(docs_dir.glob('*.py')):
+        if path.name.startswith('_'):
+            continue
+        spec = importlib.util.spec_from_file_location(f'_docs_{path.stem}', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        for name, f in inspect.getmembers(module, inspect.isfunction):
+            if f.__module__ != module.__name__ or inspect.iscoroutinefunction(f):
+                continue
+            if list(inspect.signature(f).parameters) != ['view']:
+                continue
+            recorder = _Recorder()
+            try:
+                f(recorder)
+            except _Stop:
+                pass
+            except Exception:
+                continue
+            for page in recorder.pages:
+                pages.append((f'{path.stem}.{name}', page))
+    return pages
+
+
+def form_page(n: int) -> Box:
+    return Box(items=[
+        '# Order form',
+        *[
+            row(
+                box(f'Item {i}', placeholder='SKU', error='Required' if i % 7 == 0 else None),
+                box('Quantity', value=i % 10, min=0, max=100),
+                box('Color', mode='menu', options=['red', 'green', 'blue']),
+                box(options=[option('ok', 'OK', caption='Confirm this line'), option('cancel', 'Cancel')]),
+            )
+            for i in range(n)
+        ],
+    ])
+
+
+def deep_page(depth: int) -> Box:
+    b = box('The end.')
+    for i in range(depth):
+        b = col(box(f'Level {i}'), b, gap=i)
+    return Box(items=[b])
+
+
+def menu_page(n: int) -> Box:
+    return Box(items=[box('Pick one', mode='menu', options=[option(f'sku{i}', f'SKU #{i}') for i in range(n)])])
+
+
+def large_pages() -> List[Tuple[str, Box]]:
+    return [
+        ('form x 1000', form_page(1000)),
+        ('deep x 200', deep_page(200)),
+        ('menu x 10000', menu_page(10000)),
+    ]
@@ -0,0 +1,68 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Measures what dedupe= costs and saves: the time to encode a page with and without content references,
+# the size of the first frame (everything is new to the client), and the size of the same page sent again.
+#
+# Usage: python benchmarks/dedupe.py
+#
+
+import timeit
+from h2o_nitro.core import _MsgType, _marshal, _dump, _Dedupe, _max_dedupe_entries
+from corpus import docs_pages, large_pages
+
+threshold = 256  # as in View(dedupe=256)
+
+
+def frame(d) -> bytes:
+    return _marshal(dict(t=_MsgType.Update, d=d))
+
+
+def plain(pages) -> list:
+    return [frame(_dump(p, True)) for p in pages]
+
+
+def deduped(pages, deduper: _Dedupe) -> list:
+    return [frame(deduper(_dump(p, True))) for p in pages]
+
+
+def new_deduper() -> _Dedupe:
+    return _Dedupe(_max_dedupe_entries, threshold, True)
+
+
+def bench(label: str, pages, number: int):
+    pages = [p for _, p in pages]
+    t_plain = min(timeit.repeat(lambda: plain(pages), number=number, repeat=5)) / number
+    t_dedupe = min(timeit.repeat(lambda: deduped(pages, new_deduper()), number=number, repeat=5)) / number
+    first = sum(map(len, plain(pages)))
+    deduper = new_deduper()
+    first_deduped = sum(map(len, deduped(pages, deduper)))
+    again = sum(map(len, deduped(pages, deduper)))
+    print(
+        f'{label:<16} {t_plain * 1e3:>9.2f} {t_dedupe * 1e3:>9.2f} '
+        f'{first:>10} {first_deduped:>10} {first:>10} {again:>10}'
+    )
+
+
+def main():
+    print(f'{"":<16} {"time ms":>19} {"first frame bytes":>21} {"same page again bytes":>21}')
+    print(f'{"pages":<16} {"plain":>9} {"dedupe":>9} {"plain":>10} {"dedupe":>10} {"plain":>10} {"dedupe":>10}')
+    bench('docs examples', docs_pages(), 20)
+    for name, page in large_pages():
+        bench(name, [(name, page)], 5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Compares row-encoded (one map per option) and columnar (parallel arrays) option lists.
+#
+# Usage: python benchmarks/options.py
+#
+
+import timeit
+from h2o_nitro import core, box, option
+from h2o_nitro.core import _MsgType, _marshal, _dump
+
+n = 50_000
+
+option_sets = [
+    ('strings', [f'SKU-{i:06d}' for i in range(n)]),
+    ('pairs', [(f'sku{i}', f'SKU #{i}') for i in range(n)]),
+    ('dict', {f'sku{i}': f'SKU #{i}' for i in range(n)}),
+    ('options', [option(f'sku{i}', f'SKU #{i}', caption='In stock', icon='Tag') for i in range(n)]),
+]
+
+
+def pack(options) -> bytes:
+    return _marshal(dict(t=_MsgType.Update, d=_dump(box('Pick one', mode='menu', options=options))))
+
+
+def measure(options):
+    size = len(pack(options))
+    t = min(timeit.repeat(lambda: pack(options), number=3, repeat=3)) / 3
+    return size, t
+
+
+def main():
+    print(f'{n} options')
+    print(f'{"kind":<10} {"rows KB":>10} {"rows ms":>10} {"cols KB":>10} {"cols ms":>10}')
+    columnar_min = core._columnar_min
+    for name, options in option_sets:
+        core._columnar_min = float('inf')
+        rows_size, rows_t = measure(options)
+        core._columnar_min = columnar_min
+        cols_size, cols_t = measure(options)
+        print(
+            f'{name:<10} {rows_size / 1024:>10.1f} {rows_t * 1e3:>10.1f} '
+            f'{cols_size / 1024:>10.1f} {cols_t * 1e3:>10.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Compares the table-driven serializer against the dict-per-box serializer it replaced.
+# Also checks that both produce identical bytes for every page.
+#
+# Usage: python benchmarks/serialize.py
+#
+
+import timeit
+from collections import OrderedDict
+from h2o_nitro import core
+from h2o_nitro.core import Box, Option, _MsgType, _marshal, _clean, _dump
+from corpus import docs_pages, large_pages
+
+
+# The serializer as it was before the field table: one dict per object, cleaned afterwards.
+
+def _legacy_dump(x):
+    if isinstance(x, OrderedDict):
+        return _legacy_dump([(k, v) for k, v in x.items()])
+    if isinstance(x, (tuple, list, set)):
+        return [_legacy_dump(e) for e in x]
+    if isinstance(x, Box):
+        return _legacy_dump_box(x)
+    if isinstance(x, Option):
+        return _legacy_dump_option(x)
+    if callable(getattr(x, 'dump', None)):
+        return x.dump()
+    return x
+
+
+def _legacy_dump_option(o: Option) -> dict:
+    return _clean(dict(
+        value=o.value,
+        text=o.text,
+        name=o.name,
+        icon=o.icon,
+        caption=o.caption,
+        selected=o.selected,
+        options=_legacy_dump(o.options),
+    ))
+
+
+def _legacy_dump_box(b: Box) -> dict:
+    return _clean(dict(
+        text=b.text,
+        name=b.name,
+        mode=b.mode,
+        value=b.value,
+        options=_legacy_dump(b.options),
+        items=_legacy_dump(b.items),
+        row=b.row,
+        tile=b.tile,
+        cross_tile=b.cross_tile,
+        wrap=b.wrap,
+        gap=b.gap,
+        grow=b.grow,
+        shrink=b.shrink,
+        basis=b.basis,
+        align=b.align,
+        width=b.width,
+        height=b.height,
+        margin=b.margin,
+        padding=b.padding,
+        color=b.color,
+        background=b.background,
+        border=b.border,
+        image=b.image,
+        fit=b.fit,
+        icon=b.icon,
+        min=b.min,
+        max=b.max,
+        step=b.step,
+        precision=b.precision,
+        range=b.range,
+        mask=b.mask,
+        prefix=b.prefix,
+        suffix=b.suffix,
+        placeholder=b.placeholder,
+        error=b.error,
+        lines=b.lines,
+        multiple=b.multiple,
+        required=b.required,
+        password=b.password,
+        editable=b.editable,
+    ))
+
+
+def legacy(b: Box) -> bytes:
+    return _marshal(_clean(dict(t=_MsgType.Update, d=_legacy_dump(b), p=None)))
+
+
+def current(b: Box) -> bytes:
+    return _marshal(_clean(dict(t=_MsgType.Update, d=_dump(b), p=None)))
+
+
+def bench(label: str, pages, number: int):
+    for name, page in pages:
+        if legacy(page) != current(page):
+            raise AssertionError(f'{name}: output differs')
+    t_legacy = min(timeit.repeat(lambda: [legacy(p) for _, p in pages], number=number, repeat=5)) / number
+    t_current = min(timeit.repeat(lambda: [current(p) for _, p in pages], number=number, repeat=5)) / number
+    print(f'{label:<24} {len(pages):>6} {t_legacy * 1e3:>12.3f} {t_current * 1e3:>12.3f} {t_legacy / t_current:>8.2f}x')
+
+
+def main():
+    core._columnar_min = float('inf')  # compare row-encoded options only; see options.py for columnar.
+    print(f'{"pages":<24} {"count":>6} {"legacy ms":>12} {"current ms":>12} {"speedup":>9}')
+    bench('docs examples', docs_pages(), 20)
+    for name, page in large_pages():
+        bench(name, [(name, page)], 5)
+
+
+if __name__ == '__main__':
+    main()
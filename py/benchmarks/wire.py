@@ -0,0 +1,70 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# Compares boxes keyed by field name against the compact wire format (integer keys and modes, see wire.py).
+# Reports frame sizes, before and after deflate, and the time to pack and unpack every page.
+#
+# Usage: python benchmarks/wire.py
+#
+
+import timeit
+import zlib
+import msgpack
+from h2o_nitro.core import _MsgType, _marshal, _dump
+from corpus import docs_pages, large_pages
+
+
+def pack(page, compact: bool) -> bytes:
+    return _marshal(dict(t=_MsgType.Update, d=_dump(page, compact)))
+
+
+def unpack(b: bytes) -> dict:
+    return msgpack.unpackb(b, strict_map_key=False)
+
+
+def deflated_size(b: bytes) -> int:
+    deflate = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return len(deflate.compress(b) + deflate.flush())
+
+
+def measure(pages, compact: bool, number: int):
+    frames = [pack(p, compact) for _, p in pages]
+    size = sum(map(len, frames))
+    deflated = sum(map(deflated_size, frames))
+    t_pack = min(timeit.repeat(lambda: [pack(p, compact) for _, p in pages], number=number, repeat=5)) / number
+    t_unpack = min(timeit.repeat(lambda: [unpack(f) for f in frames], number=number, repeat=5)) / number
+    return size, deflated, t_pack, t_unpack
+
+
+def bench(label: str, pages, number: int):
+    names = measure(pages, False, number)
+    compact = measure(pages, True, number)
+    print(f'{label:<16} {"names":<8} {names[0] / 1024:>10.1f} {names[1] / 1024:>10.1f} '
+          f'{names[2] * 1e3:>10.3f} {names[3] * 1e3:>10.3f}')
+    print(f'{"":<16} {"compact":<8} {compact[0] / 1024:>10.1f} {compact[1] / 1024:>10.1f} '
+          f'{compact[2] * 1e3:>10.3f} {compact[3] * 1e3:>10.3f}')
+    print(f'{"":<16} {"saved":<8} {1 - compact[0] / names[0]:>10.1%} {1 - compact[1] / names[1]:>10.1%} '
+          f'{1 - compact[2] / names[2]:>10.1%} {1 - compact[3] / names[3]:>10.1%}')
+
+
+def main():
+    print(f'{"pages":<16} {"keys":<8} {"KB":>10} {"KB (zip)":>10} {"pack ms":>10} {"unpack ms":>10}')
+    bench('docs examples', docs_pages(), 20)
+    for name, page in large_pages():
+        bench(name, [(name, page)], 5)
+
+
+if __name__ == '__main__':
+    main()
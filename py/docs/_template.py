@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from h2o_nitro import web_directory, View, box, option, row, col, ContextSwitchError, lorem, Theme, \
-    __version__ as version
+import base64
+from h2o_nitro import web_directory, asset_route, serve_asset, View, box, option, row, col, ContextSwitchError, \
+    lorem, Theme, __version__ as version
 import simple_websocket
 from flask import Flask, request, send_from_directory
 
@@ -71,6 +72,12 @@ def home_page():
     return send_from_directory(web_directory, 'index.html')
 
 
+@app.route(asset_route + '<key>')
+def asset(key):
+    status, headers, body = serve_asset(key, request.headers.get('If-None-Match'))
+    return body, status, headers
+
+
 @app.route('/nitro', websocket=True)
 def socket():
     ws = simple_websocket.Server(request.environ)
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import base64
 from h2o_nitro import View, box, row, col, option, lorem
 
 
@@ -88,3 +89,14 @@ def image_background_pattern(view: View):
         image='data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAYAAABytg0kAAAAEUlEQVQIHWNggIBiEGUFxJUABisBJ85jLc8AAAAASUVORK5CYII=',
         fit='none', height=300
     ))
+
+
+# ## Bytes
+# `image=` can also be set to the contents of an image: `bytes`, a file-like object, or any object that supports
+# the buffer protocol, like a NumPy array. This is handy for plots and thumbnails generated on the fly.
+#
+# The contents are not sent along with the page. Instead, they are held in an in-memory cache and served at
+# a URL derived from the contents, so the browser downloads each image once, however many times it is displayed.
+def image_bytes(view: View):
+    tile = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAYAAABytg0kAAAAEUlEQVQIHWNggIBiEGUFxJUABisBJ85jLc8AAAAASUVORK5CYII=')
+    view(box('# Bytes!', image=tile, fit='none', height=300))
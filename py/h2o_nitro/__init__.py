@@ -12,7 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .core import View, AsyncView, Box, BoxArrange, BoxAlign, Option, Theme, box, option, row, col, \
-    ProtocolError, ContextSwitchError, RemoteError, web_directory, lorem
+from .core import View, AsyncView, Box, BoxArrange, BoxAlign, Option, OptionSource, Theme, box, option, \
+    option_source, row, col, ProtocolError, ContextSwitchError, RemoteError, web_directory, asset_route, serve_asset, \
+    JournalStore, MemoryJournal, SQLiteJournal, TokenJournal, Admission, OverloadError, \
+    ContextStore, SpillingContext, lorem
+from .static import serve_file
+from .asgi import ASGIApp
 
 __version__ = "0.5.0"
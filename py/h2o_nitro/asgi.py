@@ -0,0 +1,113 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Optional, Union
+from .core import View, AsyncView, OverloadError, web_directory, asset_route, serve_asset
+from .static import serve_file
+
+
+def _header(scope: dict, name: bytes) -> Optional[str]:
+    for k, v in scope.get('headers', ()):
+        if k == name:
+            return v.decode('latin-1')
+    return None
+
+
+class ASGIApp:
+    # An ASGI app that serves a Nitro app, without a web framework: the web client's files, assets, and sessions
+    # over a websocket at route. Runs under any ASGI server:
+    #
+    #     app = ASGIApp(nitro)  # then: uvicorn app:app
+    #
+    # Blocking-style apps (View) are run with serve_async() (requires greenlet).
+    def __init__(
+            self,
+            nitro: Union[View, AsyncView],
+            route: str = '/nitro',
+            directory: str = web_directory,
+    ):
+        self.nitro = nitro
+        self.route = route
+        self.directory = directory
+        self._serve: Callable = nitro.serve_async if isinstance(nitro, View) else nitro.serve
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable):
+        t = scope['type']
+        if t == 'websocket':
+            await self._socket(scope, receive, send)
+        elif t == 'http':
+            await self._http(scope, receive, send)
+        elif t == 'lifespan':
+            while True:
+                event = await receive()
+                if event['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif event['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+    async def _socket(self, scope: dict, receive: Callable, send: Callable):
+        if scope['path'] != self.route:
+            await send({'type': 'websocket.close', 'code': 1008})
+            return
+        if (await receive())['type'] != 'websocket.connect':
+            return
+        await send({'type': 'websocket.accept'})
+        closed = False
+
+        async def send_frame(frame: bytes):
+            await send({'type': 'websocket.send', 'bytes': frame})
+
+        async def recv_frame():
+            nonlocal closed
+            while True:
+                m = await receive()
+                if m['type'] == 'websocket.receive':
+                    data = m.get('bytes')
+                    if data is None:
+                        text = m.get('text')
+                        data = text.encode() if text is not None else None
+                    if data:
+                        return data
+                elif m['type'] == 'websocket.disconnect':
+                    closed = True
+                    return None
+
+        try:
+            await self._serve(send_frame, recv_frame)
+        except OverloadError as e:
+            await send({'type': 'websocket.close', 'code': 1013, 'reason': str(e.retry)})  # try again later
+            return
+        if not closed:
+            await send({'type': 'websocket.close', 'code': 1000})
+
+    async def _http(self, scope: dict, receive: Callable, send: Callable):
+        path = scope['path']
+        if scope['method'] not in ('GET', 'HEAD'):
+            status, headers, body = 405, {'Allow': 'GET, HEAD'}, b''
+        elif path.startswith(asset_route):
+            status, headers, body = serve_asset(path[len(asset_route):], _header(scope, b'if-none-match'))
+        else:
+            status, headers, body = serve_file(
+                path,
+                _header(scope, b'if-none-match'),
+                self.directory,
+                _header(scope, b'accept-encoding'),
+            )
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': body if scope['method'] == 'GET' else b''})
@@ -123,6 +123,58 @@ def list(kind: str):
         return
 
 
+@main.command()
+@click.argument('app')
+@click.option('--host', default='127.0.0.1', help='The address to listen on.')
+@click.option('--port', default=5000, help='The port to listen on.')
+@click.option('--workers', default=0, help='The number of worker processes. Defaults to the number of CPUs.')
+@click.option(
+    '--interface',
+    type=click.Choice(['auto', 'asgi', 'wsgi']),
+    default='auto',
+    help='Whether the app is an ASGI or a WSGI app. Detected by default.',
+)
+@click.option(
+    '--sticky',
+    is_flag=True,
+    help='Send each client address to the same worker. Not for use behind a proxy or load balancer.',
+)
+def serve(app: str, host: str, port: int, workers: int, interface: str, sticky: bool):
+    """Serve an app from several processes.
+
+    APP is the app's module and attribute, as in "app:app".
+    Serves ASGI apps (Starlette) with uvicorn, and WSGI apps (Flask) with werkzeug.
+    Connections are spread across workers by the kernel. A reconnect can land on
+    a worker that doesn't hold its session: to resume it there, keep journals in a
+    shared store (SQLiteJournal, TokenJournal). Alternatively, when clients connect
+    directly (no proxy, load balancer or NAT in between), --sticky keeps each
+    client address on one worker.
+
+    \b
+    Serve the Flask app "app" in app.py from one process per CPU:
+    $ nitro serve app:app
+
+    \b
+    Serve the Starlette app "app" in app.py from 4 processes, on all interfaces:
+    $ nitro serve app:app --workers 4 --host 0.0.0.0
+
+    \b
+    Same, with clients that connect directly sticking to one worker each:
+    $ nitro serve app:app --workers 4 --host 0.0.0.0 --sticky
+
+    """
+    from .prefork import load_app, serve as prefork
+    prefork(
+        load_app(app),
+        host=host,
+        port=port,
+        workers=workers,
+        asgi=None if interface == 'auto' else interface == 'asgi',
+        sticky=sticky,
+        echo=click.echo,
+    )
+
+
 @main.command()
 def docs():
     """Launch Nitro's interactive documentation.
@@ -12,15 +12,41 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import atexit
+import base64
+import copy
+import hashlib
+import hmac
+import inspect
+import os
+import pickle
+import queue
 import random
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from bisect import bisect_right
+from contextlib import contextmanager, asynccontextmanager
+from operator import attrgetter
 from pathlib import Path
-from typing import Optional, Sequence, Set, Tuple, List, Dict, Union, Callable
-from collections import OrderedDict
+from typing import Optional, Sequence, Set, Tuple, List, Dict, Union, Callable, Iterable, BinaryIO
+from collections import OrderedDict, deque
 import msgpack
 from enum import Enum, IntEnum
+from . import wire
 
 web_directory = str(Path(__file__).parent / 'www')
 
+
+def _digest(b: bytes, size: int) -> bytes:
+    return hashlib.blake2b(b, digest_size=size).digest()
+
+
 __xid = 0
 
 
@@ -30,6 +56,16 @@ def _xid() -> str:
     return f'p{__xid}'
 
 
+def _delegate_id(f: Callable, *salt) -> str:
+    # Named functions get ids that are stable across processes, so that journals and frozen subtrees hold up.
+    # Lambdas, closures, partials, methods and callable objects can't be told apart by name: give them a unique id.
+    qualname = getattr(f, '__qualname__', '')
+    if not inspect.isfunction(f) or '<' in qualname:
+        return _xid()
+    key = (f.__module__, qualname, f.__code__.co_firstlineno, *salt)
+    return 'p' + _digest(repr(key).encode(), 6).hex()
+
+
 class _MsgType(IntEnum):
     Error = 1
     Join = 2
@@ -39,6 +75,13 @@ class _MsgType(IntEnum):
     Insert = 6
     Update = 7
     Remove = 8
+    Patch = 9
+    Deflate = 10
+    Batch = 11
+    Query = 12
+    Result = 13
+    Leave = 14
+    Journal = 15
 
 
 _primitive = (bool, int, float, str)
@@ -64,22 +107,191 @@ class ProtocolError(Exception):
     pass
 
 
+class OverloadError(Exception):  # the session was not admitted; close the connection with 1013 (try again later).
+    def __init__(self, retry: int):
+        super().__init__('Overloaded')
+        self.retry = retry
+
+
+class _Frozen:  # a pre-encoded subtree
+    __slots__ = ('data', 'token', 'placeholder', 'sources')
+
+    def __init__(self, data: bytes, sources: Sequence = ()):
+        self.data = data
+        self.sources = sources  # option sources it refers to, kept alive with it
+        self.token = _digest(data, 16)
+        self.placeholder = msgpack.packb(self.token)
+
+    def __eq__(self, other):
+        return isinstance(other, _Frozen) and self.data == other.data
+
+    def __hash__(self):
+        return hash(self.token)
+
+
 def _marshal(d: dict):
-    return msgpack.packb(d)
+    frozen: List[_Frozen] = []
+
+    def encode(x):
+        if isinstance(x, _Frozen):
+            frozen.append(x)
+            return x.token
+        raise TypeError(f'can not serialize {type(x).__name__!r} object')
+
+    b = msgpack.packb(d, default=encode)
+    for f in set(frozen):  # splice pre-encoded subtrees in place of their placeholders.
+        b = b.replace(f.placeholder, f.data)
+    return b
 
 
 def _unmarshal(b) -> dict:
     return msgpack.unpackb(b)
 
 
-def _dump(x):  # recursive
-    if isinstance(x, OrderedDict):
-        return _dump([(k, v) for k, v in x.items()])
-    if isinstance(x, (tuple, list, set)):
-        return [_dump(e) for e in x]
-    if callable(getattr(x, 'dump', None)):
-        return x.dump()
-    return x
+def _encoder(
+        fields: Tuple[str, ...],
+        keys: tuple,
+        sparse: bool,
+        columnar: tuple,
+        column_keys: tuple,
+        codes: Dict[str, Dict[str, int]],
+) -> Callable[[object], dict]:
+    values = attrgetter(*fields)
+    codes = tuple(codes.items())
+
+    def encode(x) -> dict:
+        if sparse:
+            d = {k: v for k, v in zip(keys, values(x)) if v is not None}
+        else:
+            d = dict(zip(keys, values(x)))
+        for f in columnar:
+            v = d.get(f)
+            if v is not None:
+                c = _columns(v, column_keys)
+                if c is not None:
+                    d[f] = c
+        for f, code in codes:
+            v = d.get(f)
+            if type(v) is str:
+                d[f] = code.get(v, v)
+        return d
+
+    return encode
+
+
+class _Schema:
+    def __init__(
+            self,
+            fields: Sequence[str],
+            nested: Sequence[str] = (),
+            sparse: bool = True,
+            columnar: Sequence[str] = (),
+            keys: Optional[Dict[str, int]] = None,
+            codes: Optional[Dict[str, Sequence[str]]] = None,
+    ):
+        # If keys is set, fields are encoded with integer keys instead of their names, and the values of
+        # the fields in codes with their position in the given sequences. See wire.py.
+        keys = keys or {}
+
+        def key(f: str):
+            return keys.get(f, f)
+
+        self.fields = fields = tuple(fields)
+        self.keys = tuple(map(key, fields))
+        self.nested = tuple(map(key, nested))
+        self.sparse = sparse
+        self.columnar = tuple(map(key, columnar))
+        self.encode = _encoder(
+            fields,
+            self.keys,
+            sparse,
+            self.columnar,
+            tuple(map(_option_keys.get, _option_columns)) if keys else _option_columns,
+            {key(f): {v: i for i, v in enumerate(values)} for f, values in (codes or {}).items()},
+        )
+
+
+_schemas: Dict[type, Tuple[_Schema, _Schema]] = {}
+_schema_cache: Tuple[Dict[type, Optional[_Schema]], Dict[type, Optional[_Schema]]] = ({}, {})
+_scalar_types = frozenset((type(None), bool, int, float, str, bytes, dict, _Frozen))
+
+
+def _wire_keys(fields: Sequence[str]) -> Dict[str, int]:
+    return {f: i for i, f in enumerate(fields)}
+
+
+_box_keys = _wire_keys(wire.box_fields)
+_option_keys = _wire_keys(wire.option_fields)
+
+
+def _schema(
+        cls: type,
+        fields: Sequence[str],
+        nested: Sequence[str] = (),
+        sparse: bool = True,
+        columnar: Sequence[str] = (),
+        keys: Optional[Dict[str, int]] = None,
+        codes: Optional[Dict[str, Sequence[str]]] = None,
+):
+    # Registers two encodings for cls: by field name, and compact (see _Schema), if keys are given.
+    schema = _Schema(fields, nested, sparse, columnar)
+    _schemas[cls] = (schema, _Schema(fields, nested, sparse, columnar, keys, codes) if keys else schema)
+    for cache in _schema_cache:
+        cache.clear()
+
+
+def _schema_of(t: type, compact: bool = False) -> Optional[_Schema]:
+    cache = _schema_cache[compact]
+    try:
+        return cache[t]
+    except KeyError:
+        pass
+    schema = None
+    for base in t.__mro__:
+        s = _schemas.get(base)
+        if s:
+            if getattr(t, 'dump', None) is getattr(base, 'dump'):  # subclass did not override dump()
+                schema = s[compact]
+            break
+    cache[t] = schema
+    return schema
+
+
+def _dump(x, compact: bool = False):  # iterative; produces the same structure as calling dump() recursively.
+    if type(x) in _scalar_types:
+        return x
+    root = [x]
+    stack = [(root, 0)]
+    scalar_types, schema_of = _scalar_types, _schema_of
+    while stack:
+        parent, k = stack.pop()
+        x = parent[k]
+        schema = schema_of(type(x), compact)
+        if schema:
+            d = parent[k] = schema.encode(x)
+            for f in schema.nested:
+                if type(d.get(f)) not in scalar_types:
+                    stack.append((d, f))
+            continue
+        if isinstance(x, OrderedDict):
+            x = [[key, value] for key, value in x.items()]
+        elif not isinstance(x, (tuple, list, set)):
+            if callable(getattr(x, 'dump', None)):
+                parent[k] = x.dump()
+            continue
+        xs = parent[k] = list(x)
+        for i, e in enumerate(xs):
+            if type(e) in scalar_types:
+                continue
+            schema = schema_of(type(e), compact)
+            if schema:  # encode leaves in place, and only revisit the ones that have children.
+                d = xs[i] = schema.encode(e)
+                for f in schema.nested:
+                    if type(d.get(f)) not in scalar_types:
+                        stack.append((d, f))
+            else:
+                stack.append((xs, i))
+    return root[0]
 
 
 def _clean(d: dict) -> dict:
@@ -91,6 +303,8 @@ V = Union[N, str]
 
 
 class Option:
+    __slots__ = ('delegate', 'value', 'text', 'name', 'icon', 'caption', 'selected', 'options')
+
     def __init__(
             self,
             value: Union[V, Callable],
@@ -102,7 +316,7 @@ class Option:
             options: Optional['Options'] = None,
     ):
         self.delegate = value if callable(value) else None
-        self.value = value if self.delegate is None else _xid()
+        self.value = value if self.delegate is None else _delegate_id(value, text, name, icon, caption)
         self.text = text
         self.name = name
         self.icon = icon
@@ -111,20 +325,152 @@ class Option:
         self.options = options
 
     def dump(self) -> dict:
-        d = dict(
-            value=self.value,
-            text=self.text,
-            name=self.name,
-            icon=self.icon,
-            caption=self.caption,
-            selected=self.selected,
-            options=_dump(self.options),
-        )
-        return _clean(d)
+        return _dump(self)
+
+
+_option_columns = Option.__slots__[1:-1]  # all but delegate and options
+_option_row = attrgetter(*_option_columns)
+_columnar_min = 64
+_primitive_types = frozenset(_primitive)
+
+
+def _columns(options, keys: tuple = _option_columns) -> Optional[dict]:
+    # Encodes a large, flat option list as parallel arrays: {value: [...], text: [...], ...}, keyed by keys.
+    # Returns None if the options are better sent as-is.
+    # Plain values and dicts are left alone: they are already as compact as their columns would be.
+    if not isinstance(options, (tuple, list, set)) or len(options) < _columnar_min:
+        return None
+    first = type(next(iter(options)))
+    if first in _primitive_types or first is dict:  # most likely all alike; don't scan them
+        return None
+    options = list(options)
+    if all(type(o) is Option and o.options is None for o in options):
+        rows = list(map(_option_row, options))
+    else:
+        rows = []
+        for o in options:
+            if type(o) in _primitive_types:
+                rows.append((o, None, None, None, None, None))
+            elif isinstance(o, (tuple, list)) and len(o) == 2:
+                rows.append((o[0], o[1], None, None, None, None))
+            elif type(o) is Option and o.options is None:
+                rows.append(_option_row(o))
+            else:
+                return None
+    d = {}
+    for k, column in zip(keys, zip(*rows)):
+        if column.count(None) < len(column):
+            d[k] = list(column)
+    return d
 
 
+_schema(Option, Option.__slots__[1:], nested=('options',), columnar=('options',), keys=_option_keys)
+
 option = Option
 
+
+def _option_text(o) -> str:
+    if isinstance(o, Option):
+        return str(o.value if o.text is None else o.text)
+    if isinstance(o, (tuple, list)) and len(o) == 2:
+        return str(o[1])
+    return str(o)
+
+
+_option_sources: 'weakref.WeakValueDictionary[str, OptionSource]' = weakref.WeakValueDictionary()
+_dumping = threading.local()  # .sources: where OptionSource.dump() records itself, if set
+
+
+def _dump_sources(x, sources: list, compact: bool = False):
+    # Dumps x, collecting the option sources it refers to, which the caller keeps alive for as long as it's shown.
+    _dumping.sources = sources
+    try:
+        return _dump(x, compact)
+    finally:
+        _dumping.sources = None
+
+
+class OptionSource:
+    def __init__(
+            self,
+            options: Union[Iterable, Callable[[], Iterable]],
+            page_size: int = 50,
+            cache_size: int = 32,
+    ):
+        self.id = secrets.token_hex(8)
+        self.page_size = page_size
+        self._load = options if callable(options) else lambda: options
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._options: Optional[list] = None
+        self._keys: List[str] = []
+        self._starts: List[int] = []
+        self._haystack = ''
+        self._results: OrderedDict = OrderedDict()
+        _option_sources[self.id] = self
+
+    def _index(self) -> list:
+        with self._lock:
+            if self._options is None:
+                options = list(self._load())
+                keys = [_option_text(o).lower().replace('\n', ' ') for o in options]
+                starts, offset = [], 0
+                for k in keys:
+                    starts.append(offset)
+                    offset += len(k) + 1
+                self._keys, self._starts, self._haystack = keys, starts, '\n'.join(keys)
+                self._options = options
+            return self._options
+
+    def _search(self, q: str, n: int) -> Tuple[List[int], int]:
+        # Returns the positions of the first n hits (options that start with q, then those that contain it),
+        # and the number of hits. Only the first n are kept, so a short page costs a scan, not a list of every hit.
+        with self._lock:
+            cached = self._results.get(q)
+            if cached is not None and (len(cached[0]) >= n or len(cached[0]) == cached[1]):
+                self._results.move_to_end(q)
+                return cached
+        n = max(n, 4 * self.page_size)  # a few pages ahead, for scrolling
+        haystack, find = self._haystack, self._haystack.find
+        prefixed, contained, total = [], [], 0
+        i = find(q)
+        while i >= 0:
+            total += 1
+            if i == 0 or haystack[i - 1] == '\n':
+                if len(prefixed) < n:
+                    prefixed.append(i)
+            elif len(contained) < n:
+                contained.append(i)
+            i = find('\n', i + len(q))  # skip to the next option
+            if i < 0:
+                break
+            i = find(q, i + 1)
+        starts = self._starts
+        result = [bisect_right(starts, i) - 1 for i in (prefixed + contained)[:n]], total
+        with self._lock:
+            self._results[q] = result
+            if len(self._results) > self._cache_size:
+                self._results.popitem(last=False)
+        return result
+
+    def query(self, search: str = '', offset: int = 0, limit: int = 0) -> Tuple[list, int]:
+        options = self._index()
+        limit = limit if limit > 0 else self.page_size
+        q = search.lower().replace('\n', ' ')
+        if not q:
+            return options[offset:offset + limit], len(options)
+        hits, total = self._search(q, offset + limit)
+        return [options[k] for k in hits[offset:offset + limit]], total
+
+    def dump(self) -> dict:
+        sources = getattr(_dumping, 'sources', None)
+        if sources is not None:
+            sources.append(self)
+        return dict(source=self.id, size=self.page_size)
+
+
+option_source = OptionSource
+
 OptionPair = Tuple[V, str]
 Options = Union[
     str,
@@ -138,9 +484,103 @@ Options = Union[
     Tuple[OptionPair, ...],
     List[OptionPair],
     Set[OptionPair],
+    OptionSource,
 ]
 
-Item = Union[str, 'Box']
+_image_types = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'<svg', 'image/svg+xml'),
+    (b'<?xml', 'image/svg+xml'),
+    (b'BM', 'image/bmp'),
+    (b'\x00\x00\x01\x00', 'image/x-icon'),
+)
+
+
+def _sniff_image(data: bytes) -> str:
+    for magic, content_type in _image_types:
+        if data.startswith(magic):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    return 'application/octet-stream'
+
+
+class _Assets:  # content-addressed, least-recently-used binary blobs, shared by all sessions.
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0
+        self._blobs: 'OrderedDict[str, Tuple[bytes, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes, content_type: Optional[str] = None) -> str:
+        key = _digest(data, 16).hex()
+        with self._lock:
+            if key in self._blobs:
+                self._blobs.move_to_end(key)
+                return key
+            self._blobs[key] = (data, content_type or _sniff_image(data))
+            self.size += len(data)
+            while self.size > self.capacity and len(self._blobs) > 1:
+                _, (evicted, _) = self._blobs.popitem(last=False)
+                self.size -= len(evicted)
+        return key
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            blob = self._blobs.get(key)
+            if blob is not None:
+                self._blobs.move_to_end(key)
+            return blob
+
+
+_assets = _Assets(64 << 20)
+asset_route = '/nitro/assets/'
+
+Image = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+
+def _image_url(image: Optional[Image]) -> Optional[str]:
+    if image is None or isinstance(image, str):
+        return image
+    read = getattr(image, 'read', None)
+    data = read() if callable(read) else image
+    if isinstance(data, str):
+        data = data.encode()
+    elif not isinstance(data, bytes):
+        data = memoryview(data).tobytes()  # bytearray, array, numpy arrays, etc.
+    return asset_route + _assets.put(data)
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return etag in tags or ('W/' + etag) in tags
+
+
+def serve_asset(key: str, if_none_match: Optional[str] = None) -> Tuple[int, Dict[str, str], bytes]:
+    # Returns the HTTP status, headers and body for a request to asset_route + key.
+    etag = f'"{key}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'public, max-age=31536000, immutable',
+        'Content-Security-Policy': "default-src 'none'; style-src 'unsafe-inline'; sandbox",
+    }
+    if if_none_match and _etag_matches(etag, if_none_match):
+        return 304, headers, b''  # content-addressed, so a matching tag is current even if evicted.
+    blob = _assets.get(key)
+    if blob is None:
+        return 404, {}, b''
+    data, content_type = blob
+    headers['Content-Type'] = content_type
+    headers['Content-Length'] = str(len(data))
+    return 200, headers, data
+
+
+Item = Union[str, 'Box', _Frozen]
 Items = Union[List[Item], Tuple[Item, ...]]
 Range = Union[
     Tuple[V, V],
@@ -167,6 +607,8 @@ Sizing = Union[
 
 
 class Theme:
+    __slots__ = ('background_color', 'foreground_color', 'accent_color', 'accent_color_name')
+
     def __init__(
             self,
             background_color: str,
@@ -180,15 +622,56 @@ class Theme:
         self.accent_color_name = accent_color_name
 
     def dump(self) -> dict:
-        return dict(
-            background_color=self.background_color,
-            foreground_color=self.foreground_color,
-            accent_color=self.accent_color,
-            accent_color_name=self.accent_color_name,
-        )
+        return _dump(self)
+
+
+_schema(Theme, Theme.__slots__, sparse=False)
 
 
 class Box:
+    __slots__ = (
+        'text',
+        'name',
+        'mode',
+        'value',
+        'options',
+        'items',
+        'row',
+        'tile',
+        'cross_tile',
+        'wrap',
+        'gap',
+        'grow',
+        'shrink',
+        'basis',
+        'align',
+        'width',
+        'height',
+        'margin',
+        'padding',
+        'color',
+        'background',
+        'border',
+        'image',
+        'fit',
+        'icon',
+        'min',
+        'max',
+        'step',
+        'precision',
+        'range',
+        'mask',
+        'prefix',
+        'suffix',
+        'placeholder',
+        'error',
+        'lines',
+        'multiple',
+        'required',
+        'password',
+        'editable',
+    )
+
     def __init__(
             self,
             text: Optional[Union[str, Options]] = None,
@@ -213,7 +696,7 @@ class Box:
             color: Optional[str] = None,
             background: Optional[str] = None,
             border: Optional[str] = None,
-            image: Optional[str] = None,
+            image: Optional[Image] = None,
             fit: Optional[str] = None,
             icon: Optional[str] = None,
             min: Optional[V] = None,
@@ -264,7 +747,7 @@ class Box:
         self.color = color
         self.background = background
         self.border = border
-        self.image = image
+        self.image = _image_url(image)
         self.fit = fit
         self.icon = icon
         self.min = min
@@ -284,50 +767,22 @@ class Box:
         self.editable = editable
 
     def dump(self) -> dict:
-        return _clean(dict(
-            text=self.text,
-            name=self.name,
-            mode=self.mode,
-            value=self.value,
-            options=_dump(self.options),
-            items=_dump(self.items),
-            row=self.row,
-            tile=self.tile,
-            cross_tile=self.cross_tile,
-            wrap=self.wrap,
-            gap=self.gap,
-            grow=self.grow,
-            shrink=self.shrink,
-            basis=self.basis,
-            align=self.align,
-            width=self.width,
-            height=self.height,
-            margin=self.margin,
-            padding=self.padding,
-            color=self.color,
-            background=self.background,
-            border=self.border,
-            image=self.image,
-            fit=self.fit,
-            icon=self.icon,
-            min=self.min,
-            max=self.max,
-            step=self.step,
-            precision=self.precision,
-            range=self.range,
-            mask=self.mask,
-            prefix=self.prefix,
-            suffix=self.suffix,
-            placeholder=self.placeholder,
-            error=self.error,
-            lines=self.lines,
-            multiple=self.multiple,
-            required=self.required,
-            password=self.password,
-            editable=self.editable,
-        ))
+        return _dump(self)
+
+    def freeze(self) -> _Frozen:
+        sources = []
+        return _Frozen(_marshal(_dump_sources(self, sources)), sources)
 
 
+_schema(
+    Box,
+    Box.__slots__,
+    nested=('options', 'items'),
+    columnar=('options',),
+    keys=_box_keys,
+    codes=dict(mode=wire.box_modes),
+)
+
 box = Box
 
 
@@ -367,7 +822,7 @@ def row(
         color: Optional[str] = None,
         background: Optional[str] = None,
         border: Optional[str] = None,
-        image: Optional[str] = None,
+        image: Optional[Image] = None,
         fit: Optional[str] = None,
 ) -> Box:
     return Box(
@@ -412,7 +867,7 @@ def col(
         color: Optional[str] = None,
         background: Optional[str] = None,
         border: Optional[str] = None,
-        image: Optional[str] = None,
+        image: Optional[Image] = None,
         fit: Optional[str] = None,
 ) -> Box:
     return Box(
@@ -446,6 +901,36 @@ def _collect_delegates(d: Dict[str, Callable], options: Sequence[Option]):
             _collect_delegates(d, opt.options)
 
 
+_max_query_limit = 500
+
+
+def _is_query(msg) -> bool:
+    return isinstance(msg, dict) and msg.get('t') == _MsgType.Query
+
+
+def _answer(msg) -> Optional[dict]:
+    if not _is_query(msg):
+        return None
+    d = msg.get('d') or {}
+    source = _option_sources.get(d.get('s'))
+    options, total = [], 0
+    if source:
+        try:
+            offset, limit = max(0, int(d.get('o') or 0)), min(int(d.get('n') or source.page_size), _max_query_limit)
+        except (TypeError, ValueError, OverflowError):  # from the client: answer nothing rather than end the session
+            source = None
+    if source:
+        options, total = source.query(str(d.get('q') or ''), offset, limit)
+    return dict(t=_MsgType.Result, d=dict(r=d.get('r'), o=_dump(options), n=total))
+
+
+async def _answer_async(msg) -> Optional[dict]:
+    # Like _answer(), off the event loop: indexing or searching a large source would stall every session on it.
+    if not _is_query(msg):
+        return None
+    return await asyncio.get_running_loop().run_in_executor(None, _answer, msg)
+
+
 def _interpret(msg, expected: int):
     if isinstance(msg, dict):
         t = msg.get('t')
@@ -472,20 +957,1091 @@ def _interpret(msg, expected: int):
     raise ProtocolError(f'unknown message format: want dict, got {type(msg)}')
 
 
-def _marshal_set(
+def _set_message(
         title: str = None,
         caption: str = None,
         menu: Optional[Sequence[Option]] = None,
         nav: Optional[Sequence[Option]] = None,
         theme: Optional[Theme] = None,
+        schema: Optional[str] = None,
+        session: Optional[str] = None,
+        resume: Optional[str] = None,
 ) -> dict:
-    return _marshal(dict(t=_MsgType.Set, d=_clean(dict(
+    return dict(t=_MsgType.Set, d=_clean(dict(
         title=title,
         caption=caption,
         menu=_dump(menu),
         nav=_dump(nav),
         theme=_dump(theme),
-    ))))
+        schema=schema,
+        session=session,
+        resume=resume,
+    )))
+
+
+class _Template:
+    # What every session of an app starts out with: its settings, dumped once, the delegates in its menus, and the
+    # Set frames it joins with, packed once per encoding. Shared by sessions until one of them changes its settings.
+    def __init__(
+            self,
+            title: Optional[str],
+            caption: Optional[str],
+            menu: Sequence[Option],
+            nav: Sequence[Option],
+            theme: Optional[Theme],
+    ):
+        self.title = title
+        self.caption = caption
+        self.menu = menu
+        self.nav = nav
+        self.theme = theme
+        self.delegates: Dict[str, Callable] = dict()
+        _collect_delegates(self.delegates, menu)
+        _collect_delegates(self.delegates, nav)
+        self._setting: Optional[dict] = None
+        self._messages: Dict[bool, dict] = {}
+        self._frames: Dict[tuple, bytes] = {}
+        self._lock = threading.Lock()
+
+    def setting(self) -> dict:
+        if self._setting is None:
+            self._setting = _clean(dict(
+                title=self.title,
+                caption=self.caption,
+                menu=_dump(self.menu),
+                nav=_dump(self.nav),
+                theme=_dump(self.theme),
+            ))
+        return self._setting
+
+    def message(self, compact: bool) -> dict:
+        with self._lock:
+            msg = self._messages.get(compact)
+            if msg is None:
+                d = self.setting()
+                msg = self._messages[compact] = dict(t=_MsgType.Set, d=dict(d, schema=wire.version) if compact else d)
+            return msg
+
+    def frame(self, view: '_View') -> bytes:
+        c = view._compressor
+        key = (view._compacting, c and (c.threshold, c.level), view._channel)
+        msg = self.message(view._compacting)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                frame = self._frames[key] = view._pack(msg)
+            return frame
+
+    def changed(
+            self,
+            title: Optional[str],
+            caption: Optional[str],
+            menu: Optional[Sequence[Option]],
+            nav: Optional[Sequence[Option]],
+            theme: Optional[Theme],
+    ) -> '_Template':  # a template with the given settings changed, or this one, if none would change.
+        d = self.setting()
+        if (
+                (title is None or title == self.title) and
+                (caption is None or caption == self.caption) and
+                (menu is None or _dump(menu) == d.get('menu')) and
+                (nav is None or _dump(nav) == d.get('nav')) and
+                (theme is None or _dump(theme) == d.get('theme'))
+        ):
+            return self
+        return _Template(
+            self.title if title is None else title,
+            self.caption if caption is None else caption,
+            self.menu if menu is None else menu,
+            self.nav if nav is None else nav,
+            self.theme if theme is None else theme,
+        )
+
+
+def _retain(msgs: List[dict], msg: dict):
+    # Appends msg to msgs, dropping the messages it supersedes: all updates, if it replaces the page,
+    # or the last update to the same position, if nothing was inserted since.
+    if msg.get('t') == _MsgType.Update:
+        p = msg.get('p')
+        if p is None:
+            msgs[:] = [m for m in msgs if m.get('t') == _MsgType.Set]
+        else:
+            for i in range(len(msgs) - 1, -1, -1):
+                t = msgs[i].get('t')
+                if t == _MsgType.Insert or (t == _MsgType.Update and msgs[i].get('p') is None):
+                    break
+                if t == _MsgType.Update and msgs[i].get('p') == p:
+                    del msgs[i]
+                    break
+    msgs.append(msg)
+
+
+def _diff(a, b, path: List[int], ops: List[dict], items: Union[str, int]):  # recursive
+    if a == b:
+        return
+    if isinstance(a, dict) and isinstance(b, dict):
+        items_a, items_b = a.get(items), b.get(items)
+        if isinstance(items_a, list) == isinstance(items_b, list):
+            changed = {k: v for k, v in b.items() if k not in a or type(a[k]) is not type(v) or a[k] != v}
+            for k in a:
+                if k not in b:
+                    changed[k] = None  # unset
+            if isinstance(items_b, list):
+                changed.pop(items, None)
+                _diff_items(items_a, items_b, path, ops, items)
+            if changed:
+                ops.append(dict(t=_MsgType.Update, p=path, d=changed, m=True))
+            return
+    ops.append(dict(t=_MsgType.Update, p=path, d=b))
+
+
+def _diff_items(a: list, b: list, path: List[int], ops: List[dict], items: Union[str, int]):
+    n_a, n_b = len(a), len(b)
+    head = 0
+    while head < n_a and head < n_b and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < n_a - head and tail < n_b - head and a[n_a - 1 - tail] == b[n_b - 1 - tail]:
+        tail += 1
+    m_a, m_b = n_a - head - tail, n_b - head - tail
+    m = min(m_a, m_b)
+    for i in range(head, head + m):
+        _diff(a[i], b[i], path + [i], ops, items)
+    for i in range(head + m, head + m_b):
+        ops.append(dict(t=_MsgType.Insert, p=path + [i], d=b[i]))
+    for _ in range(m_b, m_a):
+        ops.append(dict(t=_MsgType.Remove, p=path + [head + m]))
+
+
+def _patch_message(a: dict, b: dict, compact: bool = False) -> Optional[dict]:
+    ops = []
+    _diff(a, b, [], ops, _box_keys['items'] if compact else 'items')
+    if len(ops) == 1 and not ops[0]['p'] and not ops[0].get('m'):  # page replaced wholesale
+        return None
+    return dict(t=_MsgType.Patch, d=ops)
+
+
+def _frozen_token(x):
+    if isinstance(x, _Frozen):
+        return x.token
+    raise TypeError(f'can not serialize {type(x).__name__!r} object')
+
+
+_max_dedupe_entries = 1024
+
+
+class _Dedupe:
+    # Replaces large subtrees of a page (boxes, markdown, option lists) with references to their content hash.
+    # The first time a subtree is sent, it is sent in full and tagged with its hash: {'#': hash, '=': subtree}.
+    # After that, within the same message or later ones, it is sent as {'#': hash}.
+    #
+    # The client keeps what it is sent in an LRU cache of `capacity` entries. This keeps a mirror of that cache:
+    # subtrees are visited in the order the client resolves them (children first), so both evict the same entries.
+    def __init__(self, capacity: int, threshold: int, compact: bool):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.items = _box_keys['items'] if compact else 'items'
+        self.options = _box_keys['options'] if compact else 'options'
+        self._sent: 'OrderedDict[str, None]' = OrderedDict()
+
+    def __call__(self, page):
+        hashes: Dict[int, str] = {}
+        self._hash(page, hashes)
+        return self._emit(page, hashes, True)
+
+    def _key(self, x, b: bytes, hashes: Dict[int, str]) -> Optional[dict]:
+        if len(b) < self.threshold:
+            return None
+        h = hashes[id(x)] = _digest(b, 8).hex()
+        return {'#': h}
+
+    def _hash(self, x, hashes: Dict[int, str]):  # returns x, with large subtrees replaced by their keys.
+        if isinstance(x, _Frozen):
+            return self._key(x, x.data, hashes) or x
+        if isinstance(x, str):
+            return self._key(x, msgpack.packb(x), hashes) or x
+        if not isinstance(x, dict):
+            return x
+        c = dict(x)
+        items = x.get(self.items)
+        if isinstance(items, list):
+            c[self.items] = [self._hash(e, hashes) for e in items]
+        options = x.get(self.options)
+        if options is not None:
+            c[self.options] = self._key(options, msgpack.packb(options, default=_frozen_token), hashes) or options
+        return self._key(x, msgpack.packb(c, default=_frozen_token), hashes) or c
+
+    def _emit(self, x, hashes: Dict[int, str], box: bool):
+        sent = self._sent
+        h = hashes.get(id(x))
+        if h is not None and h in sent:
+            sent.move_to_end(h)
+            return {'#': h}
+        if box and isinstance(x, dict):
+            x = dict(x)
+            items = x.get(self.items)
+            if isinstance(items, list):
+                x[self.items] = [self._emit(e, hashes, True) for e in items]
+            options = x.get(self.options)
+            if options is not None:
+                x[self.options] = self._emit(options, hashes, False)
+        if h is None:
+            return x
+        sent[h] = None
+        if len(sent) > self.capacity:
+            sent.popitem(last=False)
+        return {'#': h, '=': x}
+
+
+class _Compressor:
+    def __init__(self, threshold: int, level: int = 6):
+        self.threshold = threshold
+        self.level = level
+        self.frames = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.cpu_seconds = 0.0
+
+    def __call__(self, frame: bytes, channel=None) -> bytes:
+        if len(frame) < self.threshold:
+            return frame
+        start = time.thread_time()
+        deflate = zlib.compressobj(self.level, zlib.DEFLATED, -15)  # raw deflate, no zlib header
+        packed = _marshal(_clean(dict(t=_MsgType.Deflate, d=deflate.compress(frame) + deflate.flush(), c=channel)))
+        self.cpu_seconds += time.thread_time() - start
+        if len(packed) >= len(frame):
+            return frame
+        self.frames += 1
+        self.raw_bytes += len(frame)
+        self.sent_bytes += len(packed)
+        return packed
+
+    def stats(self) -> dict:
+        return dict(
+            frames=self.frames,
+            raw_bytes=self.raw_bytes,
+            sent_bytes=self.sent_bytes,
+            saved_bytes=self.raw_bytes - self.sent_bytes,
+            cpu_seconds=self.cpu_seconds,
+        )
+
+
+# A session's journal is the list of messages that drove it (inputs and context switches), interleaved with the
+# results of steps run with view.step(). Each entry is a [type, value] pair; steps have type 0.
+JournalEntry = List
+
+
+class JournalStore:
+    def load(self, session: str, token: Optional[str]) -> Optional[List[JournalEntry]]:
+        # Returns the journal for session, or None if there isn't one.
+        raise NotImplementedError()
+
+    def save(self, session: str, entries: List[JournalEntry]) -> Optional[str]:
+        # Saves the journal after an entry was appended; returns a token to pass to the client, if any.
+        raise NotImplementedError()
+
+
+class MemoryJournal(JournalStore):
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._journals: 'OrderedDict[str, List[JournalEntry]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, session: str, token: Optional[str]) -> Optional[List[JournalEntry]]:
+        with self._lock:
+            entries = self._journals.get(session)
+            return None if entries is None else list(entries)
+
+    def save(self, session: str, entries: List[JournalEntry]) -> Optional[str]:
+        with self._lock:
+            self._journals[session] = entries
+            self._journals.move_to_end(session)
+            if len(self._journals) > self.capacity:
+                self._journals.popitem(last=False)
+
+
+class SQLiteJournal(JournalStore):
+    def __init__(self, path: str, ttl: int = 86400):
+        self.ttl = ttl
+        self._path = path
+        self._connect()
+        self._lock = threading.Lock()
+        _after_fork(self, SQLiteJournal._connect)
+
+    def _connect(self):
+        self._db = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            'create table if not exists journal (session text, seq integer, entry blob, time real, '
+            'primary key (session, seq))'
+        )
+        self._db.execute('create index if not exists journal_time on journal (time)')
+
+    def load(self, session: str, token: Optional[str]) -> Optional[List[JournalEntry]]:
+        with self._lock:  # sessions expire whole: save() keeps all of a session's rows at the time of its last write.
+            self._db.execute('delete from journal where time < ?', (time.time() - self.ttl,))
+            rows = self._db.execute('select entry from journal where session = ? order by seq', (session,)).fetchall()
+        return [msgpack.unpackb(entry) for entry, in rows] if rows else None
+
+    def save(self, session: str, entries: List[JournalEntry]) -> Optional[str]:
+        seq = len(entries) - 1
+        with self._lock:
+            with self._db:  # one transaction; also drops entries left over from a replay that diverged.
+                self._db.execute('begin')
+                self._db.execute('delete from journal where session = ? and seq >= ?', (session, seq))
+                now = time.time()
+                self._db.execute('update journal set time = ? where session = ?', (now, session))
+                self._db.execute(
+                    'insert into journal values (?, ?, ?, ?)',
+                    (session, seq, msgpack.packb(entries[-1]), now),
+                )
+
+
+class TokenJournal(JournalStore):  # stateless: the client holds the journal, signed.
+    def __init__(self, secret: Union[str, bytes]):
+        self._secret = secret.encode() if isinstance(secret, str) else secret
+
+    def _sign(self, payload: bytes) -> str:
+        return base64.urlsafe_b64encode(hmac.new(self._secret, payload, hashlib.sha256).digest()).decode()
+
+    def load(self, session: str, token: Optional[str]) -> Optional[List[JournalEntry]]:
+        if not isinstance(token, str) or '.' not in token:
+            return None
+        payload, signature = token.rsplit('.', 1)
+        if not hmac.compare_digest(self._sign(payload.encode()), signature):
+            return None
+        try:
+            signed_session, entries = msgpack.unpackb(zlib.decompress(base64.urlsafe_b64decode(payload)))
+        except Exception:
+            return None
+        return entries if signed_session == session else None
+
+    def save(self, session: str, entries: List[JournalEntry]) -> Optional[str]:
+        payload = base64.urlsafe_b64encode(zlib.compress(msgpack.packb([session, entries]))).decode()
+        return payload + '.' + self._sign(payload.encode())
+
+
+_unset = object()
+
+
+class ContextStore:  # holds the values set with view[key] = value, by session.
+    def get(self, session: str, key: str, default=None):  # default if key was never set (None is a value)
+        raise NotImplementedError()
+
+    def set(self, session: str, key: str, value):
+        raise NotImplementedError()
+
+    def clear(self, session: str):
+        raise NotImplementedError()
+
+    def size(self, session: str) -> int:  # bytes held for session
+        raise NotImplementedError()
+
+
+class SpillingContext(ContextStore):
+    # Keeps up to `capacity` bytes of values in memory, across all sessions; least recently used values
+    # spill over to a sqlite file, and are loaded back when read. Values are sized by their pickled length.
+    # A value modified in place after it was set is only kept if it has not been spilled since.
+    # Several processes may share a path: each only reads and deletes the rows it spilled itself.
+    def __init__(self, capacity: int = 64 << 20, path: Optional[str] = None):
+        self.capacity = capacity
+        self.memory = 0
+        self._values: 'OrderedDict[Tuple[str, str], Tuple[any, int]]' = OrderedDict()  # value, size
+        self._keys: Dict[str, Set[str]] = {}
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._path = path
+        self._connect()
+        _after_fork(self, SpillingContext._reconnect)
+        _at_exit(self, SpillingContext._release)
+
+    def _connect(self):
+        self._owner = secrets.token_hex(8)
+        self._file = None
+        path = self._path
+        if path is None:
+            path = self._file = os.path.join(tempfile.gettempdir(), f'nitro-context-{os.getpid()}.db')
+            if os.path.exists(path):  # left over from a dead process with the same pid
+                os.remove(path)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            'create table if not exists spilled (owner text, session text, key text, value blob, '
+            'primary key (owner, session, key))'
+        )
+
+    def _reconnect(self):  # in a forked worker: rows spilled by the parent are the parent's, so forget them.
+        self._connect()
+        self._keys, self._sizes = {}, {}
+        for (session, key), (_, size) in self._values.items():
+            self._keys.setdefault(session, set()).add(key)
+            self._sizes[session] = self._sizes.get(session, 0) + size
+
+    def _release(self):
+        self._db.execute('delete from spilled where owner = ?', (self._owner,))
+        self._db.close()
+        if self._file is not None:
+            os.remove(self._file)
+
+    def get(self, session: str, key: str, default=None):
+        k = (session, key)
+        with self._lock:
+            entry = self._values.get(k)
+            if entry is not None:
+                self._values.move_to_end(k)
+                return entry[0]
+            keys = self._keys.get(session)
+            if not keys or key not in keys:
+                return default
+            row = self._db.execute(
+                'select value from spilled where owner = ? and session = ? and key = ?', (self._owner, *k)
+            ).fetchone()
+            if row is None:  # gone from under us: a miss
+                keys.discard(key)
+                return default
+            data, = row
+            self._db.execute('delete from spilled where owner = ? and session = ? and key = ?', (self._owner, *k))
+            value = pickle.loads(data)
+            self._values[k] = (value, len(data))
+            self.memory += len(data)
+            self._spill()
+            return value
+
+    def set(self, session: str, key: str, value):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        k = (session, key)
+        with self._lock:
+            self._discard(k)
+            self._values[k] = (value, size)
+            self._keys.setdefault(session, set()).add(key)
+            self._sizes[session] = self._sizes.get(session, 0) + size
+            self.memory += size
+            self._spill()
+
+    def _discard(self, k: Tuple[str, str]):
+        session, key = k
+        keys = self._keys.get(session)
+        if not keys or key not in keys:
+            return
+        entry = self._values.pop(k, None)
+        if entry is not None:
+            size = entry[1]
+            self.memory -= size
+        else:
+            row = self._db.execute(
+                'select length(value) from spilled where owner = ? and session = ? and key = ?', (self._owner, *k)
+            ).fetchone()
+            size = row[0] if row else 0
+            self._db.execute('delete from spilled where owner = ? and session = ? and key = ?', (self._owner, *k))
+        keys.discard(key)
+        self._sizes[session] -= size
+
+    def _spill(self):
+        while self.memory > self.capacity and len(self._values) > 1:
+            k, (value, size) = self._values.popitem(last=False)
+            self._db.execute(
+                'insert into spilled values (?, ?, ?, ?)',
+                (self._owner, *k, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+            )
+            self.memory -= size
+
+    def clear(self, session: str):
+        with self._lock:
+            for key in self._keys.pop(session, ()):
+                entry = self._values.pop((session, key), None)
+                if entry is not None:
+                    self.memory -= entry[1]
+            self._sizes.pop(session, None)
+            self._db.execute('delete from spilled where owner = ? and session = ?', (self._owner, session))
+
+    def size(self, session: str) -> int:
+        return self._sizes.get(session, 0)
+
+    def stats(self) -> dict:
+        return dict(
+            sessions=len(self._sizes),
+            memory_bytes=self.memory,
+            total_bytes=sum(self._sizes.values()),
+        )
+
+
+def _after_fork(obj, reconnect: Callable):  # sqlite connections must not be shared with forked workers
+    if hasattr(os, 'register_at_fork'):
+        ref = weakref.ref(obj)
+        os.register_at_fork(after_in_child=lambda: ref() is not None and reconnect(ref()))
+
+
+def _at_exit(obj, release: Callable):
+    ref = weakref.ref(obj)
+    atexit.register(lambda: ref() is not None and release(ref()))
+
+
+def _resident_memory() -> int:  # bytes; Linux only, else 0.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class Admission:
+    # Caps concurrent sessions at max_sessions, and holds new sessions off while the process is using more than
+    # max_memory bytes. Up to max_waiting sessions queue for up to timeout seconds; the rest are rejected.
+    # Rejected sessions raise OverloadError, with a hint to retry after `retry` seconds.
+    def __init__(
+            self,
+            max_sessions: int = 0,
+            max_memory: int = 0,
+            max_waiting: int = 0,
+            timeout: float = 10,
+            retry: int = 5,
+    ):
+        self.max_sessions = max_sessions
+        self.max_memory = max_memory
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.retry = retry
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: 'deque[Callable]' = deque()  # wakes a queued session, in arrival order
+        self._lock = threading.Lock()
+
+    def _full(self) -> bool:
+        return (0 < self.max_sessions <= self.active) or (0 < self.max_memory < _resident_memory())
+
+    def _enter(self, wake: Callable) -> bool:  # true if admitted, false if queued.
+        with self._lock:
+            if not self._waiters and not self._full():
+                self.active += 1
+                self.admitted += 1
+                return True
+            if len(self._waiters) >= self.max_waiting:
+                self.rejected += 1
+                raise OverloadError(self.retry)
+            self._waiters.append(wake)
+            self.queued += 1
+            return False
+
+    def _give_up(self, wake: Callable):
+        if self._withdraw(wake):  # else admitted just as the wait ran out
+            with self._lock:
+                self.timed_out += 1
+            raise OverloadError(self.retry)
+
+    def _withdraw(self, wake: Callable) -> bool:  # true if the session was still queued, false if admitted.
+        with self._lock:
+            if wake in self._waiters:
+                self._waiters.remove(wake)
+                return True
+            return False
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+            while self._waiters and not self._full():
+                self.active += 1
+                self.admitted += 1
+                self._waiters.popleft()()
+
+    @contextmanager
+    def admit(self):
+        event = threading.Event()
+        if not self._enter(event.set) and not event.wait(self.timeout):
+            self._give_up(event.set)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    @asynccontextmanager
+    async def admit_async(self):
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: admitted.done() or admitted.set_result(None))
+
+        if not self._enter(wake):
+            try:
+                await asyncio.wait_for(asyncio.shield(admitted), self.timeout)
+            except asyncio.TimeoutError:
+                self._give_up(wake)
+            except BaseException:  # cancelled while queued: leave the queue, or the slot it was just given.
+                if not self._withdraw(wake):
+                    self._exit()
+                raise
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def stats(self) -> dict:
+        return dict(
+            active=self.active,
+            waiting=len(self._waiters),
+            admitted=self.admitted,
+            queued=self.queued,
+            rejected=self.rejected,
+            timed_out=self.timed_out,
+            memory=_resident_memory(),
+        )
+
+
+class _Demux:  # routes the messages on a multiplexed connection to per-channel inboxes.
+    def __init__(self, new_inbox: Callable):
+        self._new_inbox = new_inbox
+        self._inboxes: Dict[any, any] = {}
+
+    def __call__(self, frame) -> Optional[tuple]:
+        # Returns the channel and inbox if the frame opened a channel.
+        msg = _unmarshal(frame)
+        if not isinstance(msg, dict):
+            raise ProtocolError(f'unknown message format: want dict, got {type(msg)}')
+        t, channel = msg.get('t'), msg.get('c')
+        inbox = self._inboxes.get(channel)
+        if t == _MsgType.Leave:
+            if inbox is not None:
+                del self._inboxes[channel]
+                inbox.put_nowait(None)
+            return None
+        if inbox is None:
+            if t != _MsgType.Join:  # stale message for a channel that was left
+                return None
+            inbox = self._inboxes[channel] = self._new_inbox()
+            inbox.put_nowait(msg)
+            return channel, inbox
+        inbox.put_nowait(msg)
+        return None
+
+    def close(self):
+        for inbox in self._inboxes.values():
+            inbox.put_nowait(None)
+        self._inboxes.clear()
+
+
+class _Parking:
+    # Sessions whose client disconnected, by resume token, waiting out a grace period for the client to rejoin.
+    # A rejoining connection is handed to its session through a slot (a queue) that the session waits on.
+    def __init__(self, new_slot: Callable):
+        self._new_slot = new_slot
+        self._slots: Dict[str, any] = {}
+        self._lock = threading.Lock()
+
+    def park(self, token: str):
+        with self._lock:
+            slot = self._slots[token] = self._new_slot()
+        return slot
+
+    def resume(self, token, connection: tuple) -> bool:
+        with self._lock:
+            slot = self._slots.pop(token, None) if isinstance(token, str) else None
+            if slot is None:
+                return False
+            slot.put_nowait(connection)
+            return True
+
+    def expire(self, token: str) -> bool:  # false if the session was resumed just as its grace period ran out.
+        with self._lock:
+            return self._slots.pop(token, None) is not None
+
+
+async def _drive(g):
+    # Runs a greenlet to completion on the event loop: each awaitable it switches out with is awaited,
+    # and the greenlet is switched back in with the result (or the exception raised).
+    result = g.switch()
+    while not g.dead:
+        try:
+            value = await result
+        except BaseException as e:
+            result = g.throw(e)
+        else:
+            result = g.switch(value)
+    return result
+
+
+class _Timer:
+    __slots__ = ('due', 'callback', 'arg')
+
+    def __init__(self, due: int, callback: Callable, arg):
+        self.due = due
+        self.callback = callback
+        self.arg = arg
+
+
+class _TimerWheel:
+    # Fires callbacks after a delay, to the nearest tick, from a single thread shared by all sessions.
+    # Timers hash into slots by due tick; each tick, only the current slot is scanned.
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self._slots: List[Set[_Timer]] = [set() for _ in range(slots)]
+        self._now = int(time.monotonic() / tick)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, delay: float, callback: Callable, arg=None) -> _Timer:
+        with self._lock:
+            now = int(time.monotonic() / self.tick)
+            if self._thread is None:
+                self._now = now  # the wheel stood still until now; don't catch up on ticks nobody waited for
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            timer = _Timer(now + max(1, round(delay / self.tick)), callback, arg)
+            self._slots[timer.due % len(self._slots)].add(timer)
+            return timer
+
+    def cancel(self, timer: _Timer):
+        with self._lock:
+            self._slots[timer.due % len(self._slots)].discard(timer)
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick)
+            now = int(time.monotonic() / self.tick)
+            expired: List[_Timer] = []
+            with self._lock:
+                while self._now < now:
+                    self._now += 1
+                    slot = self._slots[self._now % len(self._slots)]
+                    due = [t for t in slot if t.due <= self._now]
+                    slot.difference_update(due)
+                    expired.extend(due)
+            for timer in expired:
+                try:
+                    timer.callback(timer.arg)
+                except Exception:
+                    pass
+
+
+_timers = _TimerWheel()
+
+_max_outbox = 1000
+
+
+class _Writer:
+    # Sends a session's updates from a thread of its own, at most one frame per interval (sooner if urgent).
+    # Updates superseded before they are sent are dropped (see _retain); all other frames sent for the session
+    # must go through send(). Producers block while the outbox is full.
+    def __init__(self, write: Callable, send: Callable, interval: float):
+        self.raw = send
+        self._write = write  # packs messages into a frame
+        self._interval = interval
+        self._msgs: List[dict] = []
+        self._held = 0
+        self._urgent = False
+        self._closed = False
+        self._sent_at = 0.0
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def send(self, frame: bytes):
+        with self._send_lock:
+            self.raw(frame)
+
+    def put(self, msg: dict, urgent: bool):
+        with self._cond:
+            while len(self._msgs) >= _max_outbox and not self._closed:
+                self._cond.wait()
+            _retain(self._msgs, msg)
+            self._urgent = self._urgent or urgent
+            self._cond.notify_all()
+
+    def offer(self, msg: dict) -> bool:  # like put(), but gives up instead of waiting for room
+        with self._cond:
+            if len(self._msgs) >= _max_outbox or self._closed:
+                return False
+            _retain(self._msgs, msg)
+            self._cond.notify_all()
+            return True
+
+    def hold(self):
+        with self._cond:
+            self._held += 1
+
+    def release(self):
+        with self._cond:
+            self._held -= 1
+            self._cond.notify_all()
+
+    def close(self):  # sends what's left
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _next(self) -> Optional[List[dict]]:
+        with self._cond:
+            while True:
+                if not self._msgs or (self._held and not self._urgent and not self._closed):  # a read flushes
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+                delay = self._sent_at + self._interval - time.monotonic()
+                if delay <= 0 or self._urgent or self._closed:
+                    break
+                self._cond.wait(delay)
+            msgs, self._msgs, self._urgent = self._msgs, [], False
+            self._cond.notify_all()
+            return msgs
+
+    def _run(self):
+        while True:
+            msgs = self._next()
+            if msgs is None:
+                return
+            try:
+                for frame in self._write(msgs):
+                    self.send(frame)
+            except Exception:  # connection lost; the reader finds out.
+                pass
+            self._sent_at = time.monotonic()
+
+
+class _AsyncWriter:  # like _Writer, on a task. offer() may be called from any thread.
+    def __init__(self, write: Callable, send: Callable, interval: float):
+        self.raw = send
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._write = write
+        self._interval = interval
+        self._msgs: List[dict] = []
+        self._held = 0
+        self._urgent = False
+        self._closed = False
+        self._sent_at = 0.0
+        self._wake = asyncio.Event()
+        self._room = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def send(self, frame: bytes):
+        async with self._send_lock:
+            await self.raw(frame)
+
+    async def put(self, msg: dict, urgent: bool):
+        while len(self._msgs) >= _max_outbox and not self._closed:
+            self._room.clear()
+            await self._room.wait()
+        _retain(self._msgs, msg)
+        self._urgent = self._urgent or urgent
+        self._wake.set()
+
+    def offer(self, msg: dict) -> bool:
+        if len(self._msgs) >= _max_outbox or self._closed:
+            return False
+        if threading.get_ident() == self._loop_thread:
+            return self._offer(msg)
+        try:
+            self._loop.call_soon_threadsafe(self._offer, msg)
+        except RuntimeError:  # the loop is closed
+            return False
+        return True
+
+    def _offer(self, msg: dict) -> bool:
+        if len(self._msgs) >= _max_outbox or self._closed:  # filled up, or closed, on the way over
+            return False
+        _retain(self._msgs, msg)
+        self._wake.set()
+        return True
+
+    def hold(self):
+        self._held += 1
+
+    def release(self):
+        self._held -= 1
+        self._wake.set()
+
+    async def close(self):
+        self._closed = True
+        self._wake.set()
+        await self._task
+
+    async def _next(self) -> Optional[List[dict]]:
+        while True:
+            self._wake.clear()
+            if not self._msgs or (self._held and not self._urgent and not self._closed):  # a read flushes
+                if self._closed:
+                    return None
+                await self._wake.wait()
+                continue
+            delay = self._sent_at + self._interval - time.monotonic()
+            if delay <= 0 or self._urgent or self._closed:
+                break
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        msgs, self._msgs, self._urgent = self._msgs, [], False
+        self._room.set()
+        return msgs
+
+    async def _run(self):
+        while True:
+            msgs = await self._next()
+            if msgs is None:
+                return
+            try:
+                for frame in self._write(msgs):
+                    await self.send(frame)
+            except Exception:  # connection lost; the reader finds out.
+                pass
+            self._sent_at = time.monotonic()
+
+
+class _Bulletin(dict):
+    # An update broadcast to many sessions. It is dumped once per wire format, and packed once per encoding;
+    # sessions that encode alike share the same bytes.
+    def __init__(self, b: Box, position: Optional[int]):
+        super().__init__(_clean(dict(t=_MsgType.Update, p=position)))
+        self.box = b
+        self._msgs: Dict[bool, dict] = {}
+        self._frames: Dict[tuple, bytes] = {}
+        self._lock = threading.Lock()
+
+    def message(self, compact: bool) -> dict:
+        with self._lock:
+            msg = self._msgs.get(compact)
+            if msg is None:
+                msg = self._msgs[compact] = dict(self, d=_dump(self.box, compact))
+            return msg
+
+    def frame(self, view: '_View', msg: dict) -> bytes:
+        c = view._compressor
+        key = (view._compacting, c and (c.threshold, c.level), view._channel)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                frame = self._frames[key] = view._pack(msg)
+            return frame
+
+
+class _Audience:  # sessions subscribed to broadcasts, by group; None is everyone subscribed.
+    def __init__(self):
+        self._groups: Dict[Optional[str], 'weakref.WeakSet[_View]'] = {}
+        self._lock = threading.Lock()
+
+    def add(self, session: '_View', groups: Iterable[Optional[str]]):
+        with self._lock:
+            for g in groups:
+                self._groups.setdefault(g, weakref.WeakSet()).add(session)
+
+    def discard(self, session: '_View'):
+        with self._lock:
+            for members in self._groups.values():
+                members.discard(session)
+
+    def members(self, group: Optional[str]) -> List['_View']:
+        with self._lock:
+            members = self._groups.get(group)
+            return list(members) if members else []
+
+
+class _Observer:  # a read-only client of a mirrored session; frames queue up here until sent.
+    def __init__(self, wake: Callable):
+        self.frames: 'deque[bytes]' = deque()
+        self.stale = False  # fell too far behind; to be redrawn
+        self.done = False
+        self._wake = wake
+
+    def __call__(self, frame: bytes):
+        if len(self.frames) < _max_outbox:
+            self.frames.append(frame)
+        else:
+            self.frames.clear()
+            self.stale = True
+        self._wake()
+
+    def close(self):
+        self.done = True
+        self._wake()
+
+
+class _Mirror:  # observers watching a session.
+    def __init__(self, snapshot: Callable):
+        self.token = secrets.token_urlsafe(16)
+        self.lock = threading.RLock()  # held while the session paints the page
+        self._snapshot = snapshot
+        self._observers: List[_Observer] = []
+
+    def watch(self, observer: _Observer):  # (re)draws the session's page for observer, and keeps it up to date.
+        with self.lock:
+            observer.frames.clear()
+            observer.stale = False
+            observer(self._snapshot())
+            if observer not in self._observers:
+                self._observers.append(observer)
+
+    def unwatch(self, observer: _Observer):
+        with self.lock:
+            if observer in self._observers:
+                self._observers.remove(observer)
+
+    def show(self, frame: bytes):
+        for observer in self._observers:
+            observer(frame)
+
+    def close(self):
+        with self.lock:
+            observers, self._observers = self._observers, []
+        for observer in observers:
+            observer.close()
+
+
+def _observe(mirror: _Mirror, send: Callable, recv: Callable):  # until the observer leaves, or the session ends
+    wake = threading.Event()
+    observer = _Observer(wake.set)
+
+    def reading():  # observers are read-only: what they send is dropped
+        try:
+            while recv():
+                pass
+        except Exception:
+            pass
+        observer.close()
+
+    threading.Thread(target=reading, daemon=True).start()
+    mirror.watch(observer)
+    try:
+        while not observer.done:
+            wake.wait()
+            wake.clear()
+            if observer.stale:
+                mirror.watch(observer)
+            while observer.frames:
+                send(observer.frames.popleft())
+    finally:
+        mirror.unwatch(observer)
+
+
+async def _observe_async(mirror: _Mirror, send: Callable, recv: Callable):
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    observer = _Observer(lambda: loop.call_soon_threadsafe(wake.set))  # the session may paint from another thread
+
+    async def reading():
+        try:
+            while await recv():
+                pass
+        except Exception:
+            pass
+        observer.close()
+
+    reader = asyncio.ensure_future(reading())
+    mirror.watch(observer)
+    try:
+        while not observer.done:
+            await wake.wait()
+            wake.clear()
+            if observer.stale:
+                mirror.watch(observer)
+            while observer.frames:
+                await send(observer.frames.popleft())
+    finally:
+        mirror.unwatch(observer)
+        reader.cancel()
 
 
 class _View:
@@ -500,39 +2056,332 @@ class _View:
             menu: Optional[Sequence[Option]] = None,
             nav: Optional[Sequence[Option]] = None,
             theme: Optional[Theme] = None,
+            diff: bool = False,
+            compress: int = 4096,
+            compact: bool = True,
+            dedupe: int = 0,
+            journal: Optional[JournalStore] = None,
+            grace: float = 0,
+            admission: Optional[Admission] = None,
+            timeout: float = 0,
+            on_timeout: Optional[Callable] = None,
+            store: Optional[ContextStore] = None,
+            cancel: bool = False,
+            throttle: float = 0,
+            mirror: bool = False,
     ):
         self._delegate = delegate
         self.context = context or {}
         self._send = send
         self._recv = recv
-        self._title = title
-        self._caption = caption
-        self._menu = menu or []
-        self._nav = nav or []
-        self._theme = theme
-
-        self._delegates: Dict[str, Callable] = dict()
-        _collect_delegates(self._delegates, self._menu)
-        _collect_delegates(self._delegates, self._nav)
+        self._template = _Template(title, caption, menu or [], nav or [], theme)
+        self._diff = diff
+        self._page: Optional[dict] = None
+        self._sources: List[OptionSource] = []  # option sources on screen, kept alive until the page is replaced
+        self._compress = compress
+        self._compressor: Optional[_Compressor] = None
+        self._compact = compact
+        self._compacting = False
+        self._dedupe = dedupe  # bytes; larger subtrees are sent once, then by reference. 0 (default) is off.
+        self._deduper: Optional[_Dedupe] = None
+        self._channel = None
+        self._batch: Optional[List[dict]] = None
+        self._journal = journal
+        self._session_id: Optional[str] = None
+        self._entries: List[JournalEntry] = []
+        self._replay: Optional[List[JournalEntry]] = None  # set while fast-forwarding through a journal
+        self._replayed = 0
+        self._pending: List[dict] = []  # messages held back during replay
+        self._grace = grace
+        self._admission = admission
+        self._timeout = timeout
+        self._on_timeout = on_timeout
+        self._close: Optional[Callable] = None  # closes the connection, if the server provided a way to
+        self._reads = 0
+        self._expired = False
+        self._store = store
+        self._context_id = secrets.token_hex(8) if store else None
+        self._cancel = cancel
+        self._pump = None  # reads alongside the delegate, into _inbox, if cancellable or timed out without close
+        self._inbox = None
+        self._causes: 'deque[int]' = deque()  # reasons to cancel queued in _inbox: Switch, or Leave (disconnect)
+        self._throttle = throttle
+        self._writer = None  # if throttled, or subscribed to broadcasts
+        self._audience = _Audience()
+        self._greenlet = False
+        self._wait: Optional[Callable] = None  # in serve_async(): awaits, from the session's greenlet
+        self._parking: Optional[_Parking] = None
+        self._resume_token: Optional[str] = None
+        self._screen: List[dict] = []  # messages that redraw the client's screen, re-sent on resume and to observers
+        self._mirrors: Optional['weakref.WeakValueDictionary[str, _Mirror]'] = \
+            weakref.WeakValueDictionary() if mirror else None
+        self._mirror: Optional[_Mirror] = None
+        self._done = None  # set when done with a resumed connection
+
+    def _negotiate(self, msg):
+        self._compressor = self._deduper = None
+        self._compacting = False
+        self._page = None
+        if isinstance(msg, dict):
+            encodings = msg.get('encodings') or ()
+            if self._compress > 0 and 'deflate' in encodings:
+                self._compressor = _Compressor(self._compress)
+            self._compacting = self._compact and msg.get('schema') == wire.version
+            cache = msg.get('cache')
+            if self._dedupe > 0 and self._mirrors is None and isinstance(cache, int) and cache > 0:
+                self._deduper = _Dedupe(min(cache, _max_dedupe_entries), self._dedupe, self._compacting)
+
+    def _setting(self, observer: bool = False) -> dict:
+        msg = self._template.message(self._compacting)
+        if observer or (self._session_id is None and self._resume_token is None):
+            return msg  # observers are not told what would let them take over the session
+        return dict(msg, d=dict(msg['d'], **_clean(dict(session=self._session_id, resume=self._resume_token))))
 
     def _join(self, msg):
-        # XXX handle join msg
-        return _marshal_set(
-            title=self._title,
-            caption=self._caption,
-            menu=_dump(self._menu),
-            nav=_dump(self._nav),
-            theme=_dump(self._theme),
+        self._negotiate(msg)
+        if self._mirrors is not None:
+            self._mirror = _Mirror(self._snapshot)
+            self._mirrors[self._mirror.token] = self._mirror
+        if self._parking:
+            self._resume_token = secrets.token_urlsafe(16)
+        if self._journal:
+            session = msg.get('session') if isinstance(msg, dict) else None
+            entries = self._journal.load(session, msg.get('journal')) if isinstance(session, str) else None
+            if entries is None:
+                session, entries = secrets.token_urlsafe(16), []
+            self._session_id = session
+            if entries:
+                self._replay = entries
+        if self._session_id is None and self._resume_token is None:
+            return self._template.frame(self)
+        return self._pack(self._setting())
+
+    def _rejoin(self, msg) -> bytes:
+        # Reattaches to a reconnected client, and redraws its screen.
+        self._negotiate(msg)
+        return self._pack_all([self._setting()] + [self._delta(m) for m in self._screen])
+
+    def _reattach(self, connection):
+        self._send, self._recv, self._close, join, self._done = connection
+        if self._writer:
+            self._writer.raw, self._send = self._send, self._writer.send
+        return self._rejoin(join)
+
+    def _write(self, msgs: List[dict]) -> List[bytes]:
+        # Packs messages that change the page (called by the writer, if any): retains them to redraw the screen,
+        # and shows the frames to observers.
+        if self._mirror:
+            with self._mirror.lock:
+                frames = self._paint(msgs, True)
+                for frame in frames:
+                    self._mirror.show(frame)
+            return frames
+        return self._paint(msgs, self._parking is not None)
+
+    def _paint(self, msgs: List[dict], retain: bool) -> List[bytes]:
+        frames: List[bytes] = []
+        run: List[dict] = []
+        for m in msgs:
+            if isinstance(m, _Bulletin):
+                if run:
+                    frames.append(self._pack_all(run))
+                    run = []
+                msg = m.message(self._compacting)
+                if self._diff:
+                    self._page = msg['d'] if msg.get('p') is None else None
+                if retain:
+                    _retain(self._screen, msg)
+                frames.append(m.frame(self, msg))
+                continue
+            if retain:
+                _retain(self._screen, m)
+            run.append(self._delta(m))
+        if run:
+            frames.append(self._pack_all(run))
+        return frames
+
+    def _snapshot(self) -> bytes:  # redraws the page for a new observer
+        return self._pack_all([self._setting(True)] + self._screen)
+
+    @property
+    def watch_token(self) -> Optional[str]:  # observers join with this to watch the session, if mirrored
+        return self._mirror.token if self._mirror else None
+
+    def _watched(self, join) -> Optional[_Mirror]:  # the mirror an observer asked to watch, if joining as one
+        if self._mirrors is None or not isinstance(join, dict) or 'watch' not in join:
+            return None
+        mirror = self._mirrors.get(join['watch']) if isinstance(join['watch'], str) else None
+        if mirror is None:
+            raise ProtocolError('Attempt to watch unknown session')
+        return mirror
+
+    def subscribe(self, *groups: str):
+        # Receives broadcasts to any of groups, and to everyone.
+        if self._greenlet:
+            raise ValueError('broadcasts are not available in serve_async()')
+        if not self._writer:
+            self._start_writer()
+        self._audience.add(self, (None, *groups))
+
+    def broadcast(self, *items: Item, group: Optional[str] = None, position: Optional[int] = None) -> int:
+        # Sends the same update to every subscribed session (or those in group), packing it once per encoding.
+        # Sessions with a full outbox are skipped. Returns the number of sessions the update was queued for.
+        bulletin = _Bulletin(Box(items=items), position)
+        return sum(1 for s in self._audience.members(group) if s._writer and s._writer.offer(bulletin))
+
+    def _arm(self, timeout: Optional[float]) -> Optional[_Timer]:
+        t = self._timeout if timeout is None else timeout
+        if t and t > 0:
+            return _timers.schedule(t, self._expire, self._reads)
+
+    def _next_entry(self, step: bool) -> Optional[JournalEntry]:
+        # Returns the next journal entry to replay, if it is a step (or an input, if not step).
+        replay = self._replay
+        if self._replayed < len(replay):
+            entry = replay[self._replayed]
+            if (entry[0] == 0) == step:
+                self._replayed += 1
+                self._entries.append(entry)
+                return entry
+        return None
+
+    def _end_replay(self) -> Optional[bytes]:
+        # Stops replaying (the journal ran out, or the flow diverged from it); returns the held-back page.
+        self._replay = None
+        msgs, self._pending = self._pending, []
+        if msgs:
+            return self._write(msgs)[0]
+
+    def _record(self, msg) -> Optional[bytes]:
+        if self._session_id is None or not isinstance(msg, dict):
+            return None
+        t = msg.get('t')
+        if t == _MsgType.Input or t == _MsgType.Switch:
+            return self._append([t, msg.get('d')])
+
+    def _append(self, entry: JournalEntry) -> Optional[bytes]:
+        self._entries.append(entry)
+        token = self._journal.save(self._session_id, self._entries)
+        if token:
+            return self._pack(dict(t=_MsgType.Journal, d=token))
+
+    def _session(self, send: Callable, recv: Callable, context: any) -> '_View':
+        session = type(self)(
+            self._delegate,
+            context=context,
+            send=send,
+            recv=recv,
+            diff=self._diff,
+            compress=self._compress,
+            compact=self._compact,
+            dedupe=self._dedupe,
+            journal=self._journal,
+            grace=self._grace,
+            admission=self._admission,
+            timeout=self._timeout,
+            on_timeout=self._on_timeout,
+            store=self._store,
+            cancel=self._cancel,
+            throttle=self._throttle,
+            mirror=self._mirrors is not None,
         )
+        session._template = self._template  # title, caption, menu, nav and theme, compiled once per app
+        session._parking = self._parking
+        session._audience = self._audience
+        session._mirrors = self._mirrors
+        return session
+
+    def _pack(self, msg: dict) -> bytes:
+        if self._channel is not None:
+            msg = dict(msg, c=self._channel)
+        frame = _marshal(msg)
+        return self._compressor(frame, self._channel) if self._compressor else frame
+
+    def _pack_all(self, msgs: List[dict]) -> bytes:
+        return self._pack(msgs[0] if len(msgs) == 1 else dict(t=_MsgType.Batch, d=msgs))
+
+    def _frame(self, msg: dict) -> Optional[bytes]:
+        if self._replay is not None:
+            _retain(self._pending, msg)
+            return None
+        if self._batch is None:
+            return self._write([msg])[0]
+        self._batch.append(msg)
+
+    def _flush(self) -> Optional[bytes]:
+        if self._batch:
+            msgs, self._batch = self._batch, []
+            return self._write(msgs)[0]
+
+    @property
+    def compression_stats(self) -> Optional[dict]:
+        return self._compressor.stats() if self._compressor else None
+
+    def _render(self, b: Box, overwrite: bool, position: Optional[int]) -> dict:
+        sources = []
+        d = _dump_sources(b, sources, self._compacting)
+        if overwrite and position is None:
+            self._sources = sources
+        else:
+            self._sources.extend(sources)
+        return _clean(dict(
+            t=_MsgType.Update if overwrite else _MsgType.Insert,
+            d=d,
+            p=position,
+        ))
+
+    def _delta(self, msg: dict) -> dict:
+        # Leaves out what the client already has: sends a patch against the previous page, or content references.
+        t = msg.get('t')
+        if t != _MsgType.Update and t != _MsgType.Insert:
+            return msg
+        d = msg['d']
+        if self._diff:
+            prev, self._page = self._page, d if t == _MsgType.Update and msg.get('p') is None else None
+            if prev is not None and self._page is not None:
+                patch = _patch_message(prev, d, self._compacting)
+                if patch is not None:
+                    return patch
+        if self._deduper:
+            return dict(msg, d=self._deduper(d))
+        return msg
 
     def __getitem__(self, key):
+        if self._store:
+            value = self._store.get(self._context_id, key, _unset)
+            if value is not _unset:
+                return value
         return self.context.get(key)
 
     def __setitem__(self, key, value):
-        self.context[key] = value
+        if self._store:
+            self._store.set(self._context_id, key, value)
+        else:
+            self.context[key] = value
+
+    @property
+    def context_size(self) -> Optional[int]:  # bytes held in the context store for this session
+        return self._store.size(self._context_id) if self._store else None
+
+    def _cancellation(self, m) -> Optional[int]:
+        # Returns the reason to cancel the delegate's work, given a message that arrived while it was busy.
+        if isinstance(m, dict):
+            return _MsgType.Switch if m.get('t') == _MsgType.Switch else None
+        if self._parking is None or self._resume_token is None:  # disconnected, and not coming back
+            return _MsgType.Leave
+        return None
+
+    def _release(self):
+        self._audience.discard(self)
+        if self._mirror:
+            self._mirror.close()
+        if self._store:
+            self._store.clear(self._context_id)
+        if self._done:
+            self._done.set()
 
     def _delegate_for(self, key: str):
-        d = self._delegates.get(key)
+        d = self._template.delegates.get(key)
         if d is None:
             raise ProtocolError('Attempt to call unknown delegate')
         return d
@@ -550,40 +2399,288 @@ class View(_View):
             menu: Optional[Sequence[Option]] = None,
             nav: Optional[Sequence[Option]] = None,
             theme: Optional[Theme] = None,
+            diff: bool = False,
+            compress: int = 4096,
+            compact: bool = True,
+            dedupe: int = 0,
+            journal: Optional[JournalStore] = None,
+            grace: float = 0,
+            admission: Optional[Admission] = None,
+            timeout: float = 0,
+            on_timeout: Optional[Callable] = None,
+            store: Optional[ContextStore] = None,
+            cancel: bool = False,
+            throttle: float = 0,
+            mirror: bool = False,
     ):
-        super().__init__(delegate, context, send, recv, title, caption, menu, nav, theme)
-
-    def serve(self, send: Callable, recv: Callable, context: any = None):
-        View(
-            self._delegate,
-            context,
-            send,
-            recv,
-            self._title,
-            self._caption,
-            self._menu,
-            self._nav,
-            self._theme,
-        )._run()
-
-    def _run(self):
-        self._send(self._join(self._read(_MsgType.Join)))
-
-        target = None
+        super().__init__(
+            delegate,
+            context=context,
+            send=send,
+            recv=recv,
+            title=title,
+            caption=caption,
+            menu=menu,
+            nav=nav,
+            theme=theme,
+            diff=diff,
+            compress=compress,
+            compact=compact,
+            dedupe=dedupe,
+            journal=journal,
+            grace=grace,
+            admission=admission,
+            timeout=timeout,
+            on_timeout=on_timeout,
+            store=store,
+            cancel=cancel,
+            throttle=throttle,
+            mirror=mirror,
+        )
+        self._lock = threading.Lock()
+        if grace > 0:
+            self._parking = _Parking(queue.SimpleQueue)
+
+    def serve(self, send: Callable, recv: Callable, context: any = None, close: Optional[Callable] = None):
+        session = self._session(send, recv, context)
+        session._close = close
+        join = session._read(_MsgType.Join)
+        mirror = self._watched(join)
+        if mirror:
+            _observe(mirror, send, recv)
+            return
+        if self._parking:
+            done = threading.Event()
+            connection = (send, recv, close, join, done)
+            if self._parking.resume(join.get('resume') if isinstance(join, dict) else None, connection):
+                done.wait()  # the parked session now owns this connection.
+                return
+        if self._admission:
+            with self._admission.admit():
+                session._run(join)
+        else:
+            session._run(join)
+
+    async def serve_async(self, send: Callable, recv: Callable, context: any = None):
+        # Runs this (blocking-style) app on an event loop, given async send and recv:
+        # each session runs in a greenlet that suspends on reads instead of blocking a thread.
+        from greenlet import greenlet, getcurrent  # pip install greenlet
+
+        def wait(aw):
+            return getcurrent().parent.switch(aw)
+
+        session = self._session(lambda frame: wait(send(frame)), lambda: wait(recv()), context)
+        session._parking = None  # parked sessions wait on a thread
+        session._cancel = False  # reading alongside needs a thread
+        session._throttle = 0  # and so does writing
+        session._greenlet = True
+        session._wait = wait
+        loop, task = asyncio.get_running_loop(), asyncio.current_task()
+
+        def close():  # interrupts the read, unless it completed in the meantime
+            reads = session._reads
+            loop.call_soon_threadsafe(lambda: session._reads == reads and task.cancel())
+
+        session._close = close
+        if self._admission:
+            async with self._admission.admit_async():
+                await _drive(greenlet(session._run))
+        else:
+            await _drive(greenlet(session._run))
+        if session._expired and hasattr(task, 'uncancel'):
+            task.uncancel()
+
+    def multiplex(self, send: Callable, recv: Callable, context: any = None):
+        lock = threading.Lock()
+
+        def send_locked(frame: bytes):
+            with lock:
+                send(frame)
+
+        def run(channel, inbox: queue.SimpleQueue):
+            session = self._session(send_locked, inbox.get, copy.copy(context))
+            session._channel = channel
+            session._parking = None
+            session._close = lambda: inbox.put_nowait(None)
+            session._run()
+
+        demux = _Demux(queue.SimpleQueue)
+        threads: List[threading.Thread] = []
+        try:
+            while True:
+                m = recv()
+                if not m:
+                    break
+                opened = demux(m)
+                if opened:
+                    thread = threading.Thread(target=run, args=opened, daemon=True)
+                    thread.start()
+                    threads.append(thread)
+        finally:
+            demux.close()
+        for thread in threads:
+            thread.join()
+
+    def _run(self, join=None):
+        try:
+            self._send(self._join(join if join is not None else self._read(_MsgType.Join)))
+            if self._cancel or (self._timeout and self._close is None):  # else a timeout can't interrupt the read
+                self._inbox = queue.SimpleQueue()
+                self._start_pump()
+            if self._throttle > 0:
+                self._start_writer()
+
+            target = None
+            while True:
+                try:
+                    (self._delegate_for(target) if target else self._delegate)(self)
+                except ContextSwitchError as e:
+                    target = e.target
+                except InterruptError:
+                    return
+        finally:
+            if self._writer:
+                self._writer.close()
+            self._release()
+
+    def _park(self) -> bool:
+        # Waits for the client to rejoin after a disconnect; false if the grace period ran out.
+        token = self._resume_token
+        if self._parking is None or token is None or self._expired:
+            return False
+        if self._done:
+            self._done.set()
+        slot = self._parking.park(token)
+        try:
+            connection = slot.get(timeout=self._grace)
+        except queue.Empty:
+            if self._parking.expire(token):
+                return False
+            connection = slot.get_nowait()
+        frame = self._reattach(connection)  # swaps in the new connection's send
+        self._send(frame)
+        if self._pump:
+            self._start_pump()
+        return True
+
+    def _start_writer(self):
+        self._writer = _Writer(self._write, self._send, self._throttle)
+        self._send = self._writer.send
+
+    def _start_pump(self):
+        self._pump = threading.Thread(target=self._pumping, args=(self._recv,), daemon=True)
+        self._pump.start()
+
+    def _pumping(self, recv: Callable):
         while True:
             try:
-                (self._delegate_for(target) if target else self._delegate)(self)
-            except ContextSwitchError as e:
-                target = e.target
-            except InterruptError:
+                m = recv()
+                if m and not isinstance(m, dict):
+                    m = _unmarshal(m)
+            except Exception as e:
+                m = e
+            cause = self._cancellation(m) if self._cancel else None
+            with self._lock:
+                self._inbox.put(m)
+                if cause:
+                    self._causes.append(cause)
+            if not isinstance(m, dict):
                 return
 
-    def _read(self, expected: int):
-        m = self._recv()
-        if m:
-            return _interpret(_unmarshal(m), expected)
+    def _next(self):
+        if self._pump is None:
+            return self._recv()
+        m = self._inbox.get()
+        if self._cancel and self._cancellation(m):
+            with self._lock:
+                self._causes.popleft()
+        if isinstance(m, BaseException):
+            raise m
+        return m
+
+    @property
+    def cancelled(self) -> bool:
+        # True if the user has switched away or left (requires cancel=True).
+        return len(self._causes) > 0
+
+    def check(self):
+        # Call from long-running work: ends it early if the user has switched away or left (requires cancel=True).
+        if not self._causes:
+            return
+        if self._causes[0] == _MsgType.Leave:
+            raise InterruptError()
+        while True:
+            self._read(_MsgType.Input)  # skip to the switch, which raises ContextSwitchError
+
+    def _expire(self, reads: int):  # called by the timer wheel
+        with self._lock:
+            if reads == self._reads:  # still waiting on the same read
+                self._expired = True
+                if self._close:
+                    self._close()
+                elif self._inbox:
+                    self._inbox.put(None)
+
+    def _time_out(self):
+        if self._on_timeout:
+            self._on_timeout(self)
+        self.context = {}
         raise InterruptError()
 
+    def _read(self, expected: int, timeout: Optional[float] = None):
+        if self._replay is not None:
+            entry = self._next_entry(False)
+            if entry:
+                return _interpret(dict(t=entry[0], d=entry[1]), expected)
+            frame = self._end_replay()
+            if frame:
+                self._send(frame)
+        while True:
+            timer = self._arm(timeout)
+            try:
+                m = self._next()
+            except BaseException as e:
+                if not self._expired:
+                    if isinstance(e, Exception) and self._park():  # connection lost
+                        continue
+                    raise
+                m = None  # closed on timeout
+            finally:
+                if timer:
+                    _timers.cancel(timer)
+                with self._lock:
+                    self._reads += 1
+            if self._expired:
+                self._time_out()
+            if not m:
+                if self._park():
+                    continue
+                raise InterruptError()
+            msg = m if isinstance(m, dict) else _unmarshal(m)  # multiplexed messages arrive decoded
+            result = self._wait(_answer_async(msg)) if self._wait and _is_query(msg) else _answer(msg)
+            if result is None:
+                frame = self._record(msg)
+                if frame:
+                    self._send(frame)
+                return _interpret(msg, expected)
+            self._send(self._pack(result))
+
+    def step(self, f: Callable, *args, **kwargs):
+        if self._journal is None:
+            return f(*args, **kwargs)
+        if self._replay is not None:
+            entry = self._next_entry(True)
+            if entry:
+                return entry[1]
+            frame = self._end_replay()
+            if frame:
+                self._send(frame)
+        result = f(*args, **kwargs)
+        frame = self._append([0, result])
+        if frame:
+            self._send(frame)
+        return result
+
     def set(
             self,
             title: str = None,
@@ -592,7 +2689,8 @@ class View(_View):
             nav: Optional[Sequence[Option]] = None,
             theme: Optional[Theme] = None,
     ):
-        self._send(_marshal_set(
+        self._template = self._template.changed(title, caption, menu, nav, theme)
+        self._emit(_set_message(
             title=title,
             caption=caption,
             menu=menu,
@@ -600,6 +2698,35 @@ class View(_View):
             theme=theme,
         ))
 
+    def _emit(self, msg: dict, urgent: bool = False):
+        if self._writer and self._replay is None:
+            self._writer.put(msg, urgent)
+            return
+        frame = self._frame(msg)
+        if frame:
+            self._send(frame)
+
+    @contextmanager
+    def batch(self):
+        if self._writer:
+            self._writer.hold()
+            try:
+                yield
+            finally:
+                self._writer.release()
+            return
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+            frame = self._flush()
+            if frame:
+                self._send(frame)
+        finally:
+            self._batch = None
+
     def __call__(
             self,
             *items: Item,
@@ -622,8 +2749,9 @@ class View(_View):
             color: Optional[str] = None,
             background: Optional[str] = None,
             border: Optional[str] = None,
-            image: Optional[str] = None,
+            image: Optional[Image] = None,
             fit: Optional[str] = None,
+            timeout: Optional[float] = None,
     ):
         if len(items):
             b = Box(
@@ -647,13 +2775,12 @@ class View(_View):
                 image=image,
                 fit=fit,
             )
-            self._send(_marshal(_clean(dict(
-                t=_MsgType.Update if overwrite else _MsgType.Insert,
-                d=b.dump(),
-                p=position,
-            ))))
+            self._emit(self._render(b, overwrite, position), read)
         if read:
-            res = self._read(_MsgType.Input)
+            frame = self._flush()
+            if frame:
+                self._send(frame)
+            res = self._read(_MsgType.Input, timeout)
             return res
 
 
@@ -669,40 +2796,284 @@ class AsyncView(_View):
             menu: Optional[Sequence[Option]] = None,
             nav: Optional[Sequence[Option]] = None,
             theme: Optional[Theme] = None,
+            diff: bool = False,
+            compress: int = 4096,
+            compact: bool = True,
+            dedupe: int = 0,
+            journal: Optional[JournalStore] = None,
+            grace: float = 0,
+            admission: Optional[Admission] = None,
+            timeout: float = 0,
+            on_timeout: Optional[Callable] = None,
+            store: Optional[ContextStore] = None,
+            cancel: bool = False,
+            throttle: float = 0,
+            mirror: bool = False,
     ):
-        super().__init__(delegate, context, send, recv, title, caption, menu, nav, theme)
+        super().__init__(
+            delegate,
+            context=context,
+            send=send,
+            recv=recv,
+            title=title,
+            caption=caption,
+            menu=menu,
+            nav=nav,
+            theme=theme,
+            diff=diff,
+            compress=compress,
+            compact=compact,
+            dedupe=dedupe,
+            journal=journal,
+            grace=grace,
+            admission=admission,
+            timeout=timeout,
+            on_timeout=on_timeout,
+            store=store,
+            cancel=cancel,
+            throttle=throttle,
+            mirror=mirror,
+        )
+        self._task: Optional[asyncio.Task] = None  # the task reading, if any
+        self._work: Optional[asyncio.Future] = None  # the delegate's task, if cancellable
+        self._waiting = False  # true while the delegate waits on _inbox
+        self._cancelled: Optional[int] = None  # why _work was cancelled
+        if grace > 0:
+            self._parking = _Parking(asyncio.Queue)
 
     async def serve(self, send: Callable, recv: Callable, context: any = None):
-        await AsyncView(
-            self._delegate,
-            context,
-            send,
-            recv,
-            self._title,
-            self._caption,
-            self._menu,
-            self._nav,
-            self._theme,
-        )._run()
-
-    async def _run(self):
-        await self._send(self._join(await self._read(_MsgType.Join)))
-
-        target = None
+        session = self._session(send, recv, context)
+        join = await session._read(_MsgType.Join)
+        mirror = self._watched(join)
+        if mirror:
+            await _observe_async(mirror, send, recv)
+            return
+        if self._parking:
+            done = asyncio.Event()
+            connection = (send, recv, None, join, done)
+            if self._parking.resume(join.get('resume') if isinstance(join, dict) else None, connection):
+                await done.wait()  # the parked session now owns this connection.
+                return
+        if self._admission:
+            async with self._admission.admit_async():
+                await session._run(join)
+        else:
+            await session._run(join)
+
+    async def multiplex(self, send: Callable, recv: Callable, context: any = None):
+        lock = asyncio.Lock()
+
+        async def send_locked(frame: bytes):
+            async with lock:
+                await send(frame)
+
+        demux = _Demux(asyncio.Queue)
+        tasks: List[asyncio.Future] = []
+        try:
+            while True:
+                m = await recv()
+                if not m:
+                    break
+                opened = demux(m)
+                if opened:
+                    channel, inbox = opened
+                    session = self._session(send_locked, inbox.get, copy.copy(context))
+                    session._channel = channel
+                    session._parking = None
+                    tasks.append(asyncio.ensure_future(session._run()))
+        finally:
+            demux.close()
+        await asyncio.gather(*tasks)
+
+    async def _run(self, join=None):
+        try:
+            await self._send(self._join(join if join is not None else await self._read(_MsgType.Join)))
+            if self._cancel:
+                self._inbox = asyncio.Queue()
+                self._start_pump()
+            if self._throttle > 0:
+                self._start_writer()
+
+            target = None
+            while True:
+                try:
+                    if self._pump:
+                        await self._perform(target)
+                    else:
+                        await (self._delegate_for(target) if target else self._delegate)(self)
+                except ContextSwitchError as e:
+                    target = e.target
+                except InterruptError:
+                    return
+        finally:
+            if self._pump:
+                self._pump.cancel()
+            if self._writer:
+                await self._writer.close()
+            self._release()
+
+    async def _perform(self, target: Optional[str]):
+        # Runs the delegate as a task, so that a switch or a disconnect can cancel it while it's busy.
+        work = self._work = asyncio.ensure_future((self._delegate_for(target) if target else self._delegate)(self))
+        try:
+            await work
+        except asyncio.CancelledError:
+            self._work = None
+            cause, self._cancelled = self._cancelled, None
+            if cause is None or not work.cancelled():
+                raise
+            if cause == _MsgType.Leave:
+                raise InterruptError()
+            while True:
+                await self._read(_MsgType.Input)  # skip to the switch, which raises ContextSwitchError
+        finally:
+            self._work = None
+
+    def _cancel_work(self):
+        work = self._work
+        if work and not work.done():
+            self._cancelled = self._causes[0]
+            work.cancel()
+
+    def _start_writer(self):
+        self._writer = _AsyncWriter(self._write, self._send, self._throttle)
+        self._send = self._writer.send
+
+    def _start_pump(self):
+        self._pump = asyncio.ensure_future(self._pumping(self._recv))
+
+    async def _pumping(self, recv: Callable):
         while True:
             try:
-                await (self._delegate_for(target) if target else self._delegate)(self)
-            except ContextSwitchError as e:
-                target = e.target
-            except InterruptError:
+                m = await recv()
+                if m and not isinstance(m, dict):
+                    m = _unmarshal(m)
+            except Exception as e:
+                m = e
+            self._inbox.put_nowait(m)
+            cause = self._cancellation(m)
+            if cause:
+                self._causes.append(cause)
+                if not self._waiting:
+                    self._cancel_work()
+            if not isinstance(m, dict):
                 return
 
-    async def _read(self, expected: int):
-        m = await self._recv()
-        if m:
-            return _interpret(_unmarshal(m), expected)
+    async def _next(self):
+        if self._pump is None:
+            return await self._recv()
+        self._waiting = True
+        try:
+            m = await self._inbox.get()
+        finally:
+            self._waiting = False
+        if self._cancellation(m):
+            self._causes.popleft()
+        if self._causes:  # the user switched away or left while this was queued; cancel whatever comes next
+            self._cancel_work()
+        if isinstance(m, BaseException):
+            raise m
+        return m
+
+    async def _park(self) -> bool:
+        # Waits for the client to rejoin after a disconnect; false if the grace period ran out.
+        token = self._resume_token
+        if self._parking is None or token is None:
+            return False
+        if self._done:
+            self._done.set()
+        slot = self._parking.park(token)
+        try:
+            connection = await asyncio.wait_for(slot.get(), self._grace)
+        except asyncio.TimeoutError:
+            if self._parking.expire(token):
+                return False
+            connection = slot.get_nowait()
+        frame = self._reattach(connection)  # swaps in the new connection's send
+        await self._send(frame)
+        if self._pump:
+            self._start_pump()
+        return True
+
+    def _expire(self, reads: int):  # called by the timer wheel
+        task = self._task
+        if task:
+            task.get_loop().call_soon_threadsafe(self._interrupt, task, reads)
+
+    def _interrupt(self, task: asyncio.Task, reads: int):
+        if reads == self._reads and task is self._task:  # still waiting on the same read
+            self._expired = True
+            task.cancel()
+
+    async def _time_out(self):
+        if self._on_timeout:
+            r = self._on_timeout(self)
+            if inspect.isawaitable(r):
+                await r
+        self.context = {}
         raise InterruptError()
 
+    async def _read(self, expected: int, timeout: Optional[float] = None):
+        if self._replay is not None:
+            entry = self._next_entry(False)
+            if entry:
+                return _interpret(dict(t=entry[0], d=entry[1]), expected)
+            frame = self._end_replay()
+            if frame:
+                await self._send(frame)
+        while True:
+            timer = self._arm(timeout)
+            if timer:
+                self._task = asyncio.current_task()
+            try:
+                m = await self._next()
+            except asyncio.CancelledError:
+                if not self._expired:
+                    raise
+                if hasattr(self._task, 'uncancel'):
+                    self._task.uncancel()
+                m = None  # cancelled on timeout
+            except Exception:  # connection lost
+                if await self._park():
+                    continue
+                raise
+            finally:
+                if timer:
+                    _timers.cancel(timer)
+                self._task = None
+                self._reads += 1
+            if self._expired:
+                await self._time_out()
+            if not m:
+                if await self._park():
+                    continue
+                raise InterruptError()
+            msg = m if isinstance(m, dict) else _unmarshal(m)  # multiplexed messages arrive decoded
+            result = await _answer_async(msg)
+            if result is None:
+                frame = self._record(msg)
+                if frame:
+                    await self._send(frame)
+                return _interpret(msg, expected)
+            await self._send(self._pack(result))
+
+    async def step(self, f: Callable, *args, **kwargs):
+        if self._journal is not None and self._replay is not None:
+            entry = self._next_entry(True)
+            if entry:
+                return entry[1]
+            frame = self._end_replay()
+            if frame:
+                await self._send(frame)
+        result = f(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        if self._journal is not None:
+            frame = self._append([0, result])
+            if frame:
+                await self._send(frame)
+        return result
+
     async def set(
             self,
             title: str = None,
@@ -711,7 +3082,8 @@ class AsyncView(_View):
             nav: Optional[Sequence[Option]] = None,
             theme: Optional[Theme] = None,
     ):
-        await self._send(_marshal_set(
+        self._template = self._template.changed(title, caption, menu, nav, theme)
+        await self._emit(_set_message(
             title=title,
             caption=caption,
             menu=menu,
@@ -719,6 +3091,35 @@ class AsyncView(_View):
             theme=theme,
         ))
 
+    async def _emit(self, msg: dict, urgent: bool = False):
+        if self._writer and self._replay is None:
+            await self._writer.put(msg, urgent)
+            return
+        frame = self._frame(msg)
+        if frame:
+            await self._send(frame)
+
+    @asynccontextmanager
+    async def batch(self):
+        if self._writer:
+            self._writer.hold()
+            try:
+                yield
+            finally:
+                self._writer.release()
+            return
+        if self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+            frame = self._flush()
+            if frame:
+                await self._send(frame)
+        finally:
+            self._batch = None
+
     async def __call__(
             self,
             *items: Item,
@@ -741,8 +3142,9 @@ class AsyncView(_View):
             color: Optional[str] = None,
             background: Optional[str] = None,
             border: Optional[str] = None,
-            image: Optional[str] = None,
+            image: Optional[Image] = None,
             fit: Optional[str] = None,
+            timeout: Optional[float] = None,
     ):
         if len(items):
             b = Box(
@@ -766,13 +3168,12 @@ class AsyncView(_View):
                 image=image,
                 fit=fit,
             )
-            await self._send(_marshal(_clean(dict(
-                t=_MsgType.Update if overwrite else _MsgType.Insert,
-                d=b.dump(),
-                p=position,
-            ))))
+            await self._emit(self._render(b, overwrite, position), read)
         if read:
-            return await self._read(_MsgType.Input)
+            frame = self._flush()
+            if frame:
+                await self._send(frame)
+            return await self._read(_MsgType.Input, timeout)
 
 
 _lorem = '''
@@ -0,0 +1,168 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Serves a WSGI or ASGI app from several processes, forked after the app is imported.
+#
+# Each worker accepts on its own socket; the sockets share one address with SO_REUSEPORT, so the kernel spreads
+# connections across workers without a shared accept lock.
+#
+# A session lives in the worker that started it, so a reconnect that lands on another worker can't resume it there,
+# unless the app keeps its journal in a shared store (SQLiteJournal, TokenJournal). With sticky=True, connections
+# from the same client address are steered to the same worker instead (with a small BPF program attached to the
+# socket group). Only use that when clients reach the server directly: behind a reverse proxy, load balancer or
+# NAT, clients share an address, and all of them would land on one worker. There, use a shared journal store,
+# or affinity at the proxy.
+
+import ctypes
+import gc
+import importlib
+import inspect
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+_SO_ATTACH_REUSEPORT_CBPF = 51  # linux
+_SKF_NET_OFF = -0x100000  # offset of the network header, in BPF loads
+
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [('code', ctypes.c_ushort), ('jt', ctypes.c_ubyte), ('jf', ctypes.c_ubyte), ('k', ctypes.c_uint32)]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_ushort), ('filter', ctypes.POINTER(_SockFilter))]
+
+
+def load_app(spec: str):
+    # Imports an app given as "module:attribute" (attribute defaults to "app"), relative to the working directory.
+    module, _, attr = spec.partition(':')
+    sys.path.insert(0, os.getcwd())
+    return getattr(importlib.import_module(module), attr or 'app')
+
+
+def is_asgi(app) -> bool:
+    return inspect.iscoroutinefunction(app) or inspect.iscoroutinefunction(getattr(app, '__call__', None))
+
+
+def _pin_by_address(sock: socket.socket, family: int, n: int) -> bool:
+    # Picks the socket for each new connection by its client address: load the (last word of the) source
+    # address, modulo the number of sockets in the group. False if the kernel won't take the program.
+    offset = 12 if family == socket.AF_INET else 20
+    program = (_SockFilter * 3)(
+        _SockFilter(0x20, 0, 0, (_SKF_NET_OFF + offset) & 0xffffffff),  # ld [net + offset]
+        _SockFilter(0x94, 0, 0, n),  # mod #n
+        _SockFilter(0x16, 0, 0, 0),  # ret a
+    )
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, _SO_ATTACH_REUSEPORT_CBPF, bytes(_SockFprog(len(program), program)))
+        return True
+    except OSError:
+        return False
+
+
+def _listen(host: str, port: int, n: int, sticky: bool) -> Tuple[List[socket.socket], bool]:
+    # Returns one listening socket per worker, and whether clients are pinned to workers (if sticky). Falls back to
+    # a single socket shared by all workers if the platform can't share an address between sockets.
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    reuse_port = getattr(socket, 'SO_REUSEPORT', None)
+    sockets = []
+    for _ in range(n if reuse_port is not None else 1):
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port is not None:
+            sock.setsockopt(socket.SOL_SOCKET, reuse_port, 1)
+        sock.bind((host, port))
+        sock.listen(2048)  # joins the group in order: socket i is index i
+        sock.set_inheritable(True)
+        sockets.append(sock)
+    pinned = sticky and len(sockets) > 1 and _pin_by_address(sockets[0], family, len(sockets))
+    return sockets, pinned
+
+
+def _work(app, asgi: bool, sock: socket.socket, host: str, port: int):
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if asgi:
+        import uvicorn  # pip install uvicorn
+        uvicorn.Server(uvicorn.Config(app, lifespan='off')).run(sockets=[sock])
+    else:
+        from werkzeug.serving import make_server  # pip install werkzeug
+        make_server(host, port, app, threaded=True, fd=sock.fileno()).serve_forever()
+
+
+def serve(
+        app,
+        host: str = '127.0.0.1',
+        port: int = 5000,
+        workers: int = 0,
+        asgi: Optional[bool] = None,
+        sticky: bool = False,
+        echo: Callable = print,
+):
+    # Serves app from workers processes (one per CPU, by default), until interrupted. If sticky, each client
+    # address sticks to one worker; see above.
+    workers = workers or os.cpu_count() or 1
+    asgi = is_asgi(app) if asgi is None else asgi
+    sockets, pinned = _listen(host, port, workers, sticky)
+    if workers > 1 and len(sockets) == 1:
+        echo('Note: SO_REUSEPORT is not available; workers will share one socket.')
+    if workers > 1 and sticky and not pinned:
+        echo('Note: clients could not be pinned to workers; a reconnect may land on a worker without its session. '
+             'Use a shared journal store to pick sessions up there.')
+
+    # Everything allocated so far (the app, its modules) is shared with the workers, copy-on-write;
+    # keep it out of the workers' garbage collections, which would otherwise touch, and so copy, every page.
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(i: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _work(app, asgi, sockets[i % len(sockets)], host, port)
+            finally:
+                os._exit(0)
+        children[pid] = i
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for i in range(workers):
+        spawn(i)
+    echo(f'Serving {"ASGI" if asgi else "WSGI"} app on http://{host}:{port} with {workers} workers (pid {os.getpid()})')
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        i = children.pop(pid, None)
+        if i is not None and not stopping:  # the worker died; start another on its socket
+            time.sleep(0.1)
+            spawn(i)
@@ -0,0 +1,130 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Serves the web client's files (or any directory's) to HTTP requests, from memory: see serve_file().
+
+import gzip
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+from .core import web_directory, _digest, _etag_matches
+
+
+class _File:
+    def __init__(self, path: str, data: bytes):
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.etag = _digest(data, 16).hex()
+        self.immutable = bool(_fingerprinted.search(os.path.basename(path)))  # named by content; never changes
+        self.variants: Dict[str, bytes] = {'identity': data}  # by content-encoding
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):  # precompressed at build time (see make_static.py)
+            if os.path.isfile(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    self.variants[encoding] = f.read()
+        if 'gzip' not in self.variants and len(data) >= _min_compressible and _compressible(self.content_type):
+            packed = gzip.compress(data, 9, mtime=0)
+            if len(packed) < len(data):
+                self.variants['gzip'] = packed
+
+    def encoding(self, accept_encoding: Optional[str]) -> str:
+        if accept_encoding:
+            for encoding in self.variants:
+                if encoding != 'identity' and _accepts(accept_encoding, encoding):
+                    return encoding
+        return 'identity'
+
+
+def _compressible(content_type: str) -> bool:
+    return content_type.startswith('text/') or content_type in _compressible_types
+
+
+def _accepts(accept_encoding: str, encoding: str) -> bool:
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        if name.strip() == encoding:
+            q = params.strip().replace(' ', '')
+            if q.startswith('q='):
+                try:
+                    return float(q[2:]) > 0
+                except ValueError:
+                    return False
+            return True
+    return False
+
+
+class _Files:  # files under a directory, read once and kept in memory, with their compressed variants.
+    def __init__(self, directory: str):
+        self.directory = os.path.realpath(directory)
+        self._files: Dict[str, Optional[_File]] = {}  # None if missing
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[_File]:
+        f = self._files.get(path, False)
+        if f is not False:
+            return f
+        full = os.path.realpath(os.path.join(self.directory, path.lstrip('/')))
+        f = None
+        if full.startswith(self.directory + os.sep) and os.path.isfile(full):
+            with open(full, 'rb') as file:
+                f = _File(full, file.read())
+        with self._lock:
+            if len(self._files) < _max_files:
+                self._files[path] = f
+        return f
+
+
+_max_files = 4096
+_min_compressible = 1024
+_compressible_types = {
+    'application/javascript', 'application/json', 'application/manifest+json', 'application/xml',
+    'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon',
+}
+_fingerprinted = re.compile(r'\.[0-9a-f]{8,}\.')  # e.g. main.1f2e3d4c.js
+_files: Dict[str, _Files] = {}
+
+
+def serve_file(
+        path: str,
+        if_none_match: Optional[str] = None,
+        directory: str = web_directory,
+        accept_encoding: Optional[str] = None,
+) -> Tuple[int, Dict[str, str], bytes]:
+    # Returns the HTTP status, headers and body for a request to a file under directory (the web client's, by default);
+    # '/' is index.html. Files are read once, and sent compressed to clients that accept it. Fingerprinted files
+    # (with a content hash in their names) are cached for good; everything else is revalidated.
+    if path == '/' or path == '':
+        path = '/index.html'
+    files = _files.get(directory)
+    if files is None:
+        files = _files[directory] = _Files(directory)
+    f = files.get(path)
+    if f is None:
+        return 404, {}, b''
+    encoding = f.encoding(accept_encoding)
+    etag = f'"{f.etag}"' if encoding == 'identity' else f'"{f.etag}-{encoding}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'public, max-age=31536000, immutable' if f.immutable else 'no-cache',
+    }
+    if len(f.variants) > 1:
+        headers['Vary'] = 'Accept-Encoding'
+    if if_none_match and _etag_matches(etag, if_none_match):
+        return 304, headers, b''
+    data = f.variants[encoding]
+    headers['Content-Type'] = f.content_type
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    headers['Content-Length'] = str(len(data))
+    return 200, headers, data
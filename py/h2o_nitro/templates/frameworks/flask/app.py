@@ -1,24 +1,38 @@
 import simple_websocket
-from flask import Flask, request, send_from_directory
-from h2o_nitro import web_directory
+from flask import Flask, request
+from h2o_nitro import asset_route, serve_asset, serve_file, OverloadError
 
 # SAMPLE_SYNC
 
-app = Flask(__name__, static_folder=web_directory, static_url_path='')
+app = Flask(__name__, static_folder=None)
 
 
-@app.route('/')
-def home_page():
-    return send_from_directory(web_directory, 'index.html')
+@app.route('/', defaults={'path': ''})
+@app.route('/<path:path>')
+def web_file(path):  # index.html, and the web client's (precompressed, cached) files
+    status, headers, body = serve_file(
+        '/' + path,
+        request.headers.get('If-None-Match'),
+        accept_encoding=request.headers.get('Accept-Encoding'),
+    )
+    return body, status, headers
+
+
+@app.route(asset_route + '<key>')
+def asset(key):
+    status, headers, body = serve_asset(key, request.headers.get('If-None-Match'))
+    return body, status, headers
 
 
 @app.route('/nitro', websocket=True)
 def socket():
     ws = simple_websocket.Server(request.environ)
     try:
-        nitro.serve(ws.send, ws.receive)
+        nitro.serve(ws.send, ws.receive, close=ws.close)  # close lets idle sessions time out
     except simple_websocket.ConnectionClosed:
         pass
+    except OverloadError as e:
+        ws.close(1013, str(e.retry))  # try again later
     return ''
 
 
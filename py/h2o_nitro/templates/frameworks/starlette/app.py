@@ -1,28 +1,40 @@
 import uvicorn
 from starlette.applications import Starlette
-from starlette.routing import Mount
-from starlette.staticfiles import StaticFiles
-from starlette.responses import FileResponse
-from h2o_nitro import web_directory
+from starlette.responses import Response
+from h2o_nitro import asset_route, serve_asset, serve_file, OverloadError
 
 # SAMPLE_ASYNC
 
-app = Starlette(debug=True, routes=[
-    Mount('/static', app=StaticFiles(directory=f'{web_directory}/static')),
-])
+app = Starlette(debug=True)
 
 
-@app.route('/')
-async def home_page(request):
-    return FileResponse(f'{web_directory}/index.html')
+@app.route(asset_route + '{key}')
+async def asset(request):
+    status, headers, body = serve_asset(request.path_params['key'], request.headers.get('If-None-Match'))
+    return Response(body, status, headers)
 
 
 @app.websocket_route('/nitro')
 async def socket(ws):
     await ws.accept()
-    await nitro.serve(ws.send_bytes, ws.receive_bytes)
+    # For a blocking-style app (nitro = View(...)), use nitro.serve_async() instead (requires greenlet).
+    try:
+        await nitro.serve(ws.send_bytes, ws.receive_bytes)
+    except OverloadError as e:
+        await ws.close(1013, str(e.retry))  # try again later
+        return
     await ws.close()
 
 
+@app.route('/{path:path}')
+async def web_file(request):  # index.html, and the web client's (precompressed, cached) files
+    status, headers, body = serve_file(
+        request.url.path,
+        request.headers.get('If-None-Match'),
+        accept_encoding=request.headers.get('Accept-Encoding'),
+    )
+    return Response(body, status, headers)
+
+
 if __name__ == '__main__':
     uvicorn.run(app, host='0.0.0.0', port=5000)
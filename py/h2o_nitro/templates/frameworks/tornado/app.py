@@ -2,14 +2,35 @@ import tornado.ioloop
 import tornado.web
 import tornado.websocket
 import tornado.queues
-from h2o_nitro import web_directory
+from h2o_nitro import asset_route, serve_asset, serve_file, OverloadError
 
 
 # SAMPLE_ASYNC
 
-class RootHandler(tornado.web.RequestHandler):
-    def get(self):
-        self.render(f'{web_directory}/index.html')
+class FileHandler(tornado.web.RequestHandler):  # index.html, and the web client's (precompressed, cached) files
+    def get(self, path):
+        status, headers, body = serve_file(
+            '/' + path,
+            self.request.headers.get('If-None-Match'),
+            accept_encoding=self.request.headers.get('Accept-Encoding'),
+        )
+        self.set_status(status)
+        for k, v in headers.items():
+            self.set_header(k, v)
+        if body:
+            self.write(body)
+        self.finish()
+
+
+class AssetHandler(tornado.web.RequestHandler):
+    def get(self, key):
+        status, headers, body = serve_asset(key, self.request.headers.get('If-None-Match'))
+        self.set_status(status)
+        for k, v in headers.items():
+            self.set_header(k, v)
+        if body:
+            self.write(body)
+        self.finish()
 
 
 class WebSocketHandler(tornado.websocket.WebSocketHandler):
@@ -21,8 +42,15 @@ class WebSocketHandler(tornado.websocket.WebSocketHandler):
         async def send(message):  # Simple wrapper to always send binary messages.
             await self.write_message(message, binary=True)
 
+        async def serve():
+            try:
+                # For a blocking-style app (nitro = View(...)), use nitro.serve_async instead (requires greenlet).
+                await nitro.serve(send, self.queue.get)
+            except OverloadError as e:
+                self.close(1013, str(e.retry))  # try again later
+
         # Start listening to queued messages.
-        tornado.ioloop.IOLoop.current().add_callback(nitro.serve, send, self.queue.get)
+        tornado.ioloop.IOLoop.current().add_callback(serve)
 
     async def on_message(self, message):
         await self.queue.put(message)  # Push to queue.
@@ -33,10 +61,10 @@ class WebSocketHandler(tornado.websocket.WebSocketHandler):
 
 app = tornado.web.Application(
     [
-        (r"/", RootHandler),
         (r"/nitro", WebSocketHandler),
+        (asset_route + r"(\w+)", AssetHandler),
+        (r"/(.*)", FileHandler),
     ],
-    static_path=f'{web_directory}/static',
 )
 
 if __name__ == "__main__":
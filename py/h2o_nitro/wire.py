@@ -0,0 +1,81 @@
+# Generated by make_wire.py from web/src/protocol.ts. Do not edit.
+
+version = '479e28fb'
+
+box_fields = (
+    'xid',
+    'index',
+    'text',
+    'name',
+    'mode',
+    'value',
+    'options',
+    'items',
+    'row',
+    'tile',
+    'cross_tile',
+    'wrap',
+    'gap',
+    'align',
+    'width',
+    'height',
+    'margin',
+    'padding',
+    'border',
+    'color',
+    'background',
+    'image',
+    'fit',
+    'grow',
+    'shrink',
+    'basis',
+    'icon',
+    'min',
+    'max',
+    'step',
+    'precision',
+    'range',
+    'mask',
+    'prefix',
+    'suffix',
+    'placeholder',
+    'error',
+    'lines',
+    'multiple',
+    'required',
+    'password',
+    'editable',
+    'source',
+)
+
+option_fields = (
+    'value',
+    'text',
+    'name',
+    'icon',
+    'caption',
+    'selected',
+    'options',
+)
+
+box_modes = (
+    'none',
+    'md',
+    'image',
+    'button',
+    'menu',
+    'radio',
+    'check',
+    'toggle',
+    'text',
+    'range',
+    'number',
+    'time',
+    'date',
+    'day',
+    'week',
+    'month',
+    'tag',
+    'color',
+    'rating',
+)
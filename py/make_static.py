@@ -0,0 +1,92 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# This script prepares the web client's build, once copied to h2o_nitro/www, for serving with serve_file():
+# - Files that index.html refers to get a copy named by their content (favicon.ico -> favicon.1f2e3d4c.ico),
+#   and index.html is pointed at the copies, so they can be cached for good. The originals are kept.
+# - Compressible files get precompressed siblings: .gz, and .br if the brotli package is installed.
+#
+# Usage: python make_static.py [directory]
+#
+
+import gzip
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+try:
+    import brotli  # pip install brotli
+except ImportError:
+    brotli = None
+
+compressible = {'.html', '.js', '.css', '.json', '.map', '.svg', '.txt', '.ico', '.webmanifest', '.xml'}
+min_size = 1024
+fingerprinted = re.compile(r'\.[0-9a-f]{8,}\.')  # as in h2o_nitro/static.py
+
+
+def fingerprint(www: Path) -> int:
+    index = www / 'index.html'
+    html = original = index.read_text(encoding='utf8')
+    count = 0
+    for p in sorted(www.rglob('*')):
+        if not p.is_file() or p == index or p.suffix in ('.gz', '.br') or fingerprinted.search(p.name):
+            continue
+        rel = p.relative_to(www).as_posix()
+        refs = [f'"/{rel}"', f'"./{rel}"', f'"{rel}"']
+        if not any(ref in html for ref in refs):
+            continue
+        data = p.read_bytes()
+        name = f'{p.stem}.{hashlib.sha256(data).hexdigest()[:8]}{p.suffix}'
+        p.with_name(name).write_bytes(data)
+        hashed = rel[:-len(p.name)] + name
+        for ref in refs:
+            html = html.replace(ref, ref.replace(rel, hashed))
+        count += 1
+    if html != original:
+        index.write_text(html, encoding='utf8')
+    return count
+
+
+def compress(www: Path):
+    raw = packed_gz = packed_br = 0
+    for p in sorted(www.rglob('*')):
+        if not p.is_file() or p.suffix not in compressible:
+            continue
+        data = p.read_bytes()
+        if len(data) < min_size:
+            continue
+        raw += len(data)
+        gz = gzip.compress(data, 9, mtime=0)
+        if len(gz) < len(data):
+            p.with_name(p.name + '.gz').write_bytes(gz)
+            packed_gz += len(gz)
+        if brotli:
+            br = brotli.compress(data, quality=11)
+            if len(br) < len(data):
+                p.with_name(p.name + '.br').write_bytes(br)
+                packed_br += len(br)
+    return raw, packed_gz, packed_br
+
+
+def main():
+    www = Path(sys.argv[1] if len(sys.argv) > 1 else 'h2o_nitro/www')
+    print(f'Fingerprinted {fingerprint(www)} files in {www}')
+    raw, gz, br = compress(www)
+    print(f'Compressed {raw >> 10} KiB: gzip {gz >> 10} KiB' + (f', brotli {br >> 10} KiB' if brotli else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# Copyright 2022 H2O.ai, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+#
+# This script reads the Box and Option types and the BoxMode values from the web client's protocol.ts,
+# and exports them as the integer code tables used by the compact wire format, to both Python and Typescript.
+#
+# A field's code is its position in protocol.ts, so append new fields instead of inserting them.
+#
+
+import hashlib
+import re
+from pathlib import Path
+from typing import List
+from make import Printer
+
+protocol_path = Path('..') / 'web' / 'src' / 'protocol.ts'
+
+
+def parse_fields(src: str, name: str) -> List[str]:
+    m = re.search(r'^export type ' + name + r' = \{\n(.*?)^\}', src, flags=re.MULTILINE | re.DOTALL)
+    if not m:
+        raise ValueError(f'could not find type {name}')
+    return re.findall(r'^\s+(\w+)\??:', m.group(1), flags=re.MULTILINE)
+
+
+def parse_values(src: str, name: str) -> List[str]:
+    m = re.search(r'^export type ' + name + r' = (.+)$', src, flags=re.MULTILINE)
+    if not m:
+        raise ValueError(f'could not find type {name}')
+    return re.findall(r"'(\w+)'", m.group(1))
+
+
+def version_of(*tables: List[str]) -> str:
+    return hashlib.blake2b('\n'.join(' '.join(t) for t in tables).encode(), digest_size=4).hexdigest()
+
+
+def write_py(version: str, tables: dict):
+    p = Printer()
+    p('# Generated by make_wire.py from web/src/protocol.ts. Do not edit.')
+    p()
+    p(f"version = '{version}'")
+    for name, values in tables.items():
+        p()
+        p(f'{name} = (')
+        p.indent()
+        for v in values:
+            p(f"'{v}',")
+        p.dedent()
+        p(')')
+    p()
+    (Path('h2o_nitro') / 'wire.py').write_text(str(p))
+
+
+def ts_name(name: str) -> str:
+    head, *tail = name.split('_')
+    return head + ''.join(t.capitalize() for t in tail)
+
+
+def write_ts(version: str, tables: dict):
+    p = Printer('  ')
+    p('// Generated by py/make_wire.py from protocol.ts. Do not edit.')
+    p()
+    p(f"export const wireVersion = '{version}'")
+    for name, values in tables.items():
+        p()
+        p(f'export const {ts_name(name)} = [')
+        p.indent()
+        for v in values:
+            p(f"'{v}',")
+        p.dedent()
+        p(']')
+    p()
+    (protocol_path.parent / 'wire.ts').write_text(str(p))
+
+
+def main():
+    print(f'Reading {protocol_path} ...')
+    src = protocol_path.read_text()
+    tables = dict(
+        box_fields=parse_fields(src, 'Box'),
+        option_fields=parse_fields(src, 'Option'),
+        box_modes=parse_values(src, 'BoxMode'),
+    )
+    version = version_of(*tables.values())
+    for name, values in tables.items():
+        print(f'{name}: {len(values)}')
+
+    print('Generating h2o_nitro/wire.py...')
+    write_py(version, tables)
+
+    print('Generating web/src/wire.ts...')
+    write_ts(version, tables)
+
+    print('Done!')
+
+
+if __name__ == '__main__':
+    main()
@@ -41,7 +41,9 @@ setup(
         "msgpack>=1.0",
     ],
     extras_require={
-        'flask': ['flask', 'simple-websocket']
+        'flask': ['flask', 'simple-websocket'],
+        'greenlet': ['greenlet'],
+        'uvicorn': ['uvicorn'],
     },
     include_package_data=True,
     license_files=('LICENSE',),
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+from h2o_nitro import AsyncView
+from h2o_nitro.core import _MsgType, _marshal
+
+
+def test_broadcast_from_another_thread_reaches_async_session():
+    async def run():
+        inbox, sent = asyncio.Queue(), []
+        subscribed, delivered = asyncio.Event(), asyncio.Event()
+
+        async def main(view: AsyncView):
+            view.subscribe()
+            subscribed.set()
+            await view('waiting')
+
+        async def send(frame: bytes):
+            sent.append(frame)
+            if len(sent) == 3:
+                delivered.set()
+
+        app = AsyncView(main)
+        inbox.put_nowait(_marshal(dict(t=_MsgType.Join, d={})))
+        task = asyncio.ensure_future(app.serve(send, inbox.get))
+        await asyncio.wait_for(subscribed.wait(), 2)
+        while len(sent) < 2:  # the Set, and the page
+            await asyncio.sleep(0.01)
+        counts = []
+
+        def broadcast():
+            time.sleep(0.2)  # until the loop is idle
+            counts.append(app.broadcast('news'))
+
+        thread = threading.Thread(target=broadcast)
+        start = time.monotonic()
+        thread.start()
+        await asyncio.wait_for(delivered.wait(), 5)  # nothing else wakes the loop; the broadcast has to
+        assert time.monotonic() - start < 1
+        thread.join()
+        assert counts == [1]
+        inbox.put_nowait(None)
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(run())
@@ -0,0 +1,29 @@
+import queue
+from h2o_nitro import View, SpillingContext
+from h2o_nitro.core import _MsgType, _marshal
+
+
+def test_spilling_context_tells_none_from_unset():
+    store = SpillingContext(capacity=100)
+    assert store.get('s', 'k', 'unset') == 'unset'
+    store.set('s', 'k', None)
+    for i in range(5):  # spill k
+        store.set('s', f'x{i}', 'x' * 60)
+    assert store.get('s', 'k', 'unset') is None
+
+
+def test_setting_none_clears_a_value_from_the_serve_context():
+    seen = []
+
+    def main(view: View):
+        seen.append(view['user'])
+        view['user'] = None
+        seen.append(view['user'])
+        view('done')  # the connection closes here
+
+    inbox = queue.Queue()
+    inbox.put(_marshal(dict(t=_MsgType.Join, d={})))
+    inbox.put(None)
+    app = View(main, store=SpillingContext())
+    app.serve(lambda frame: None, inbox.get, context=dict(user='u'))
+    assert seen == ['u', None]
@@ -0,0 +1,29 @@
+import os
+import tempfile
+from h2o_nitro import SQLiteJournal
+from h2o_nitro import core
+
+
+def test_sqlite_journal_expires_whole_sessions(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(core.time, 'time', lambda: now[0])
+    journal = SQLiteJournal(os.path.join(tempfile.mkdtemp(), 'journal.db'), ttl=100)
+    entries = []
+    for i in range(3):  # a session that spans more than the ttl, with recent writes
+        entries.append([1, [i]])
+        journal.save('a', entries)
+        now[0] += 60
+    assert journal.load('a', None) == entries
+    journal.save('b', [[1, ['x']]])
+    now[0] += 150  # past the ttl since the last write to either
+    assert journal.load('a', None) is None
+    assert journal.load('b', None) is None
+
+
+def test_sqlite_journal_drops_entries_after_a_divergence():
+    journal = SQLiteJournal(os.path.join(tempfile.mkdtemp(), 'journal.db'))
+    journal.save('a', [[1, [0]]])
+    journal.save('a', [[1, [0]], [1, [1]]])
+    journal.save('a', [[1, [0]], [1, [1]], [1, [2]]])
+    journal.save('a', [[1, [0]], [1, [9]]])  # replay diverged at the second entry
+    assert journal.load('a', None) == [[1, [0]], [1, [9]]]
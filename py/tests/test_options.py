@@ -0,0 +1,60 @@
+import asyncio
+import random
+import time
+from h2o_nitro import AsyncView, box, option_source
+from h2o_nitro.core import _MsgType, _marshal, _unmarshal, _answer
+
+
+def test_query_pages_prefixed_then_contained():
+    rng = random.Random(42)
+    words = ['ab', 'ba', 'abab', 'xaby', 'b', 'a ab', 'abc ab']
+    options = [f'{rng.choice(words)} {rng.randint(0, 50)}' for _ in range(3000)]
+    source = option_source(options, page_size=7)
+    for q in ['ab', 'b', '1', 'ab 1', 'zz']:
+        keys = [o.lower() for o in options]
+        expected = [o for o, k in zip(options, keys) if k.startswith(q)] + \
+                   [o for o, k in zip(options, keys) if q in k and not k.startswith(q)]
+        for offset in [0, 5, 27, 100, 2000]:
+            for limit in [7, 50]:
+                assert source.query(q, offset, limit) == (expected[offset:offset + limit], len(expected))
+
+
+def test_bad_query_numbers_get_an_empty_result():
+    source = option_source([f'item {i}' for i in range(100)])
+    for d in [dict(o='x'), dict(n='ten'), dict(o=float('inf'))]:
+        result = _answer(dict(t=_MsgType.Query, d=dict(d, s=source.id, q='item', r=1)))
+        assert result['d']['n'] == 0
+
+
+def test_async_query_runs_off_the_event_loop():
+    def load():
+        time.sleep(0.5)  # a large source, indexed on first query
+        return [f'item {i}' for i in range(100)]
+
+    async def run():
+        source = option_source(load)
+        inbox, sent, ticks = asyncio.Queue(), [], []
+        answered = asyncio.Event()
+
+        async def main(view: AsyncView):
+            await view(box('Pick', mode='menu', options=source))
+
+        async def send(frame: bytes):
+            sent.append(frame)
+            if _unmarshal(frame).get('t') == _MsgType.Result:
+                answered.set()
+
+        async def tick():
+            while not answered.is_set():
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.05)
+
+        inbox.put_nowait(_marshal(dict(t=_MsgType.Join, d={})))
+        inbox.put_nowait(_marshal(dict(t=_MsgType.Query, d=dict(s=source.id, q='item 1', r=1))))
+        task = asyncio.ensure_future(AsyncView(main).serve(send, inbox.get))
+        await asyncio.wait_for(asyncio.gather(answered.wait(), tick()), 5)
+        assert len(ticks) >= 5  # the loop kept running while the source was indexed
+        inbox.put_nowait(None)
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(run())
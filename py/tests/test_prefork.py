@@ -0,0 +1,42 @@
+import socket
+import sys
+import pytest
+from h2o_nitro.prefork import _listen
+
+
+def _close(sockets):
+    for s in sockets:
+        s.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'), reason='needs SO_REUSEPORT')
+def test_listen_leaves_balancing_to_the_kernel_by_default():
+    sockets, pinned = _listen('127.0.0.1', 0, 1, False)
+    port = sockets[0].getsockname()[1]
+    _close(sockets)
+    sockets, pinned = _listen('127.0.0.1', port, 3, False)
+    try:
+        assert len(sockets) == 3
+        assert not pinned
+    finally:
+        _close(sockets)
+
+
+def test_listen_pins_only_when_sticky():
+    sockets, pinned = _listen('127.0.0.1', 0, 1, True)
+    try:
+        assert not pinned  # nothing to pin to with one worker
+    finally:
+        _close(sockets)
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='pins with a linux socket filter')
+def test_listen_pins_client_addresses_when_sticky():
+    sockets, pinned = _listen('127.0.0.1', 0, 1, False)
+    port = sockets[0].getsockname()[1]
+    _close(sockets)
+    sockets, pinned = _listen('127.0.0.1', port, 3, True)
+    try:
+        assert pinned
+    finally:
+        _close(sockets)
@@ -0,0 +1,31 @@
+import threading
+import time
+from h2o_nitro.core import _TimerWheel
+
+
+def _elapsed(wheel: _TimerWheel, delay: float) -> float:
+    fired = threading.Event()
+    start = time.monotonic()
+    wheel.schedule(delay, lambda _: fired.set())
+    assert fired.wait(delay + 1)
+    return time.monotonic() - start
+
+
+def test_first_timer_waits_its_delay():
+    wheel = _TimerWheel(tick=0.05)
+    time.sleep(0.5)  # idle, as between import and the first session
+    assert _elapsed(wheel, 0.4) >= 0.3
+
+
+def test_later_timers_wait_their_delay():
+    wheel = _TimerWheel(tick=0.05)
+    _elapsed(wheel, 0.1)
+    time.sleep(0.3)
+    assert _elapsed(wheel, 0.4) >= 0.3
+
+
+def test_cancelled_timer_does_not_fire():
+    wheel = _TimerWheel(tick=0.05)
+    fired = threading.Event()
+    wheel.cancel(wheel.schedule(0.1, lambda _: fired.set()))
+    assert not fired.wait(0.4)
@@ -0,0 +1,74 @@
+import asyncio
+import queue
+import threading
+import time
+from h2o_nitro import View, AsyncView, box
+from h2o_nitro.core import _MsgType, _marshal
+
+
+def _join() -> bytes:
+    return _marshal(dict(t=_MsgType.Join, d={}))
+
+
+def _input(*values) -> bytes:
+    return _marshal(dict(t=_MsgType.Input, d=list(values)))
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_read_in_batch_sends_page_when_throttled():
+    inbox, sent, answers = queue.Queue(), [], []
+
+    def main(view: View):
+        with view.batch():
+            view('step', read=False)
+            answers.append(view('question', box('x', value='')))
+
+    inbox.put(_join())
+    app = View(main, throttle=0.05)
+    thread = threading.Thread(target=app.serve, args=(sent.append, inbox.get), daemon=True)
+    thread.start()
+    assert _wait_for(lambda: len(sent) >= 2), 'the page was never sent'
+    assert len(sent) == 2  # one frame for the whole block; the question supersedes the step
+    inbox.put(_input('y'))
+    assert _wait_for(lambda: answers == ['y'])
+    inbox.put(None)
+    thread.join(2)
+
+
+def test_async_read_in_batch_sends_page_when_throttled():
+    async def run():
+        inbox, sent, answers = asyncio.Queue(), [], []
+
+        async def main(view: AsyncView):
+            async with view.batch():
+                await view('step', read=False)
+                answers.append(await view('question', box('x', value='')))
+
+        async def send(frame: bytes):
+            sent.append(frame)
+
+        inbox.put_nowait(_join())
+        task = asyncio.ensure_future(AsyncView(main, throttle=0.05).serve(send, inbox.get))
+        for _ in range(200):
+            if len(sent) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        assert len(sent) >= 2, 'the page was never sent'
+        inbox.put_nowait(_input('y'))
+        for _ in range(200):
+            if answers:
+                break
+            await asyncio.sleep(0.01)
+        assert answers == ['y']
+        inbox.put_nowait(None)
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(run())
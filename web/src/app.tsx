@@ -16,13 +16,17 @@ import React from 'react';
 import styled from 'styled-components';
 import { Body } from './body';
 import { Client } from './client';
-import { isN, newIncr, S, signal, U, xid } from './core';
+import { expandBox, expandPatch } from './compact';
+import { B, isN, newIncr, S, signal, U, xid } from './core';
+import { contentCacheSize } from './dedupe';
 import { Header } from './header';
 import { reIndex, sanitizeBox, sanitizeOptions } from './heuristics';
+import { applyPatch, clone } from './patch';
 import { Box, Setting, Msg, MsgType } from './protocol';
-import { Socket, SocketEvent, SocketEventT } from './socket';
+import { encodings, Socket, SocketEvent, SocketEventT } from './socket';
 import { defaultScheme, Scheme } from './theme';
-import { make } from './ui';
+import { make, resolveQuery } from './ui';
+import { wireVersion } from './wire';
 
 enum AppStateT { Connecting, Disconnected, Invalid, Connected }
 
@@ -40,12 +44,21 @@ type AppState = {
   client: Client
 }
 
-const hello: Msg = {
+const watchToken = new URLSearchParams(window.location.search).get('watch') ?? undefined
+
+const hello = (client: Client): Msg => ({
   t: MsgType.Join,
   d: {
     language: window.navigator.language, // XXX formalize
+    encodings,
+    schema: wireVersion,
+    cache: contentCacheSize,
+    session: client.rejoin.session,
+    journal: client.rejoin.token,
+    resume: client.rejoin.resume,
+    watch: watchToken, // set to watch someone else's session, read-only
   }
-}
+})
 
 const Overlay = styled.div`
   position: absolute;
@@ -76,71 +89,106 @@ const Warning = styled.div`
 `
 
 export const App = make(({ client }: { client: Client }) => {
+  let compact = false // set if the server agreed to send boxes in the compact wire format
   const
     stateB = signal<AppState>({ t: AppStateT.Connecting }),
-    onMessage = (socket: Socket, e: SocketEvent) => {
-      switch (e.t) {
-        case SocketEventT.Connect:
-          if (socket) socket.send(hello)
-          break
-        case SocketEventT.Message:
+    update = (msg: Msg): B => { // returns true if the page needs to be re-rendered
+      switch (msg.t) {
+        case MsgType.Error:
+          const { e: error } = msg
+          stateB({ t: AppStateT.Invalid, error })
+          return false
+        case MsgType.Update:
           {
-            const msg = e.message
-            switch (msg.t) {
-              case MsgType.Error:
-                const { e: error } = msg
-                stateB({ t: AppStateT.Invalid, error })
-                break
-              case MsgType.Update:
-                {
-                  const { d: box, p: position } = msg
-                  box.xid = xid()
-                  const { boxes } = client
-                  if (isN(position) && position >= 0 && position < boxes.length) {
-                    boxes[position] = box
-                  } else {
-                    boxes.length = 0
-                    boxes.push(sanitizeBox(box))
-                  }
-                  reIndex(boxes, newIncr())
-                  stateB({ t: AppStateT.Connected, socket, client })
-                }
-                break
-              case MsgType.Set:
-                {
-                  const
-                    { d: conf } = msg,
-                    { title, caption, menu, nav, theme } = conf
-
-                  if (title) client.titleB(title)
-                  if (caption) client.captionB(caption)
-                  if (menu) client.menuB(sanitizeOptions(menu))
-                  if (nav) client.navB(sanitizeOptions(nav))
-                  if (theme) {
-                    const
-                      d = defaultScheme,
-                      scheme: Scheme = {
-                        primaryFont: d.primaryFont,
-                        monospaceFont: d.monospaceFont,
-                        backgroundColor: theme.background_color ?? d.backgroundColor,
-                        foregroundColor: theme.foreground_color ?? d.foregroundColor,
-                        primaryColor: theme.accent_color ?? d.primaryColor,
-                        primaryColorName: theme.accent_color_name ?? d.primaryColorName,
-                      }
-                    client.schemeB(scheme)
-                  }
+            const
+              { p: position } = msg,
+              received = client.contents.resolve(msg.d, compact),
+              box = compact ? expandBox(received) : received
+            box.xid = xid()
+            const { boxes, sources } = client
+            if (isN(position) && position >= 0 && position < boxes.length) {
+              sources[position] = clone(box)
+              boxes[position] = box
+            } else {
+              sources.length = 0
+              sources.push(clone(box))
+              boxes.length = 0
+              boxes.push(sanitizeBox(box))
+            }
+            reIndex(boxes, newIncr())
+          }
+          return true
+        case MsgType.Patch:
+          {
+            const
+              ops = compact ? expandPatch(msg.d) : msg.d,
+              { boxes, sources } = client
+            if (!sources.length) return false
+            sources[0] = applyPatch(sources[0], ops)
+            const box = clone(sources[0])
+            box.xid = xid()
+            boxes.length = 0
+            boxes.push(sanitizeBox(box))
+            reIndex(boxes, newIncr())
+          }
+          return true
+        case MsgType.Set:
+          {
+            const
+              { d: conf } = msg,
+              { title, caption, menu, nav, theme, schema, session, resume } = conf
 
-                  const state = stateB()
-                  if (state.t === AppStateT.Connected) {
-                    stateB({ t: AppStateT.Connected, socket, client })
-                  }
+            if (schema) compact = schema === wireVersion
+            if (session && session !== client.rejoin.session) {
+              client.rejoin.session = session
+              client.rejoin.token = undefined
+            }
+            if (resume) client.rejoin.resume = resume
+            if (title) client.titleB(title)
+            if (caption) client.captionB(caption)
+            if (menu) client.menuB(sanitizeOptions(menu))
+            if (nav) client.navB(sanitizeOptions(nav))
+            if (theme) {
+              const
+                d = defaultScheme,
+                scheme: Scheme = {
+                  primaryFont: d.primaryFont,
+                  monospaceFont: d.monospaceFont,
+                  backgroundColor: theme.background_color ?? d.backgroundColor,
+                  foregroundColor: theme.foreground_color ?? d.foregroundColor,
+                  primaryColor: theme.accent_color ?? d.primaryColor,
+                  primaryColorName: theme.accent_color_name ?? d.primaryColorName,
                 }
-                break
-              default:
-                stateB({ t: AppStateT.Invalid, error: 'unknown message type' })
-                break
+              client.schemeB(scheme)
             }
           }
+          return stateB().t === AppStateT.Connected
+        case MsgType.Result:
+          resolveQuery(msg.d)
+          return false
+        case MsgType.Journal:
+          client.rejoin.token = msg.d
+          return false
+        case MsgType.Batch:
+          {
+            let changed = false
+            for (const m of msg.d) if (update(m)) changed = true
+            return changed
+          }
+        default:
+          stateB({ t: AppStateT.Invalid, error: 'unknown message type' })
+          return false
+      }
+    },
+    onMessage = (socket: Socket, e: SocketEvent) => {
+      switch (e.t) {
+        case SocketEventT.Connect:
+          compact = false
+          client.contents.clear()
+          if (socket) socket.send(hello(client))
+          break
+        case SocketEventT.Message:
+          if (update(e.message)) stateB({ t: AppStateT.Connected, socket, client })
           break
         case SocketEventT.Disconnect:
           stateB({ t: AppStateT.Disconnected, retry: e.retry })
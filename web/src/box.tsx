@@ -24,6 +24,7 @@ import { ComboBox } from './combobox';
 import { DatePicker } from './date_picker';
 import { Dropdown } from './dropdown';
 import { Droplist } from './droplist';
+import { Lookup } from './lookup';
 import { Rating } from './rating';
 import { Slider } from './slider';
 import { Spinbox } from './spinbox';
@@ -58,11 +59,13 @@ export const XBox = ({ context, box }: BoxProps) => { // recursive
     case 'week':
       return <Calendar context={context} box={box} />
     case 'menu':
-      return editable
-        ? <ComboBox context={context} box={box} />
-        : multiple
-          ? <Droplist context={context} box={box} />
-          : <Dropdown context={context} box={box} />
+      return box.source
+        ? <Lookup context={context} box={box} />
+        : editable
+          ? <ComboBox context={context} box={box} />
+          : multiple
+            ? <Droplist context={context} box={box} />
+            : <Dropdown context={context} box={box} />
     case 'number':
       return <Spinbox context={context} box={box} />
     case 'radio':
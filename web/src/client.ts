@@ -13,16 +13,20 @@
 // limitations under the License.
 
 import { loadTheme } from '@fluentui/react'
-import { S, on, signal } from './core'
+import { B, S, on, signal } from './core'
+import { contentCacheSize, newContentCache } from './dedupe'
 import { Box, Option } from './protocol'
-import { connect, Socket, SocketEvent } from './socket'
+import { connect, connectChannel, Socket, SocketEvent } from './socket'
 import { defaultScheme, loadScheme } from './theme'
 
 
-export const newClient = (endpoint: S) => {
+export const newClient = (endpoint: S, multiplexed: B = false) => {
   let _socket: Socket | null = null
   const
     boxes: Box[] = [],
+    sources: Box[] = [], // boxes as received, before sanitization; patches apply to these
+    contents = newContentCache(contentCacheSize),
+    rejoin: { session?: S, token?: S, resume?: S } = {}, // kept across reconnects, to resume the session
     titleB = signal('H2O Nitro'),
     captionB = signal('v0.1.0'),
     menuB = signal<Option[]>([]),
@@ -30,7 +34,7 @@ export const newClient = (endpoint: S) => {
     schemeB = signal(defaultScheme),
     socket = (handle: (s: Socket, e: SocketEvent) => void): Socket => {
       if (_socket) return _socket
-      return _socket = connect(endpoint, e => {
+      return _socket = (multiplexed ? connectChannel : connect)(endpoint, e => {
         if (_socket) handle(_socket, e)
       })
     }
@@ -45,6 +49,9 @@ export const newClient = (endpoint: S) => {
     navB,
     schemeB,
     boxes,
+    sources,
+    contents,
+    rejoin,
     socket,
   }
 }
@@ -0,0 +1,59 @@
+// Copyright 2022 H2O.ai, Inc.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+import { Dict, isN, isO, isS, S } from './core';
+import { Box, PatchOp } from './protocol';
+import { boxFields, boxModes, optionFields } from './wire';
+
+// In the compact wire format, box and option fields are keyed by their position in the tables in wire.ts,
+// and box modes are sent as positions in boxModes. Fields keyed by name (e.g. in frozen fragments) are left as-is.
+
+const isCode = (k: S): boolean => {
+  const c = k.charCodeAt(0)
+  return c >= 48 && c <= 57 // field names never start with a digit
+}
+
+const rename = (x: Dict<any>, fields: S[]): Dict<any> => {
+  const y: Dict<any> = {}
+  for (const k in x) y[isCode(k) ? fields[+k] ?? k : k] = x[k]
+  return y
+}
+
+const expandOption = (x: any): any => {
+  if (!isO(x) || Array.isArray(x)) return x // value or [value, text]
+  const option = rename(x, optionFields)
+  if (isO(option.options)) option.options = expandOptions(option.options)
+  return option
+}
+
+const expandOptions = (x: any): any => {
+  if (Array.isArray(x)) return x.map(expandOption)
+  if (isS(x.source)) return x // option source
+  for (const k in x) if (!Array.isArray(x[k])) return x // { value: text }
+  return rename(x, optionFields) // columns
+}
+
+export const expandBox = (x: any): Box => { // recursive
+  if (!isO(x)) return x // markdown
+  const box = rename(x, boxFields)
+  if (isN(box.mode)) box.mode = boxModes[box.mode] ?? box.mode
+  if (Array.isArray(box.items)) box.items = box.items.map(expandBox)
+  if (isO(box.options)) box.options = expandOptions(box.options)
+  return box as Box
+}
+
+export const expandPatch = (ops: PatchOp[]): PatchOp[] => {
+  for (const op of ops) if ('d' in op) op.d = expandBox(op.d)
+  return ops
+}
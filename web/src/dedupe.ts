@@ -0,0 +1,69 @@
+// Copyright 2022 H2O.ai, Inc.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+import { B, isO, isS, S, U } from './core';
+import { clone } from './patch';
+import { boxFields } from './wire';
+
+// Number of subtrees kept; advertised to the server on join.
+export const contentCacheSize = 512
+
+const
+  itemsCode = String(boxFields.indexOf('items')),
+  optionsCode = String(boxFields.indexOf('options'))
+
+const isRef = (x: any): B => isO(x) && isS(x['#'])
+
+// Subtrees sent by the server, by content hash. Large subtrees are sent in full once, as {'#': hash, '=': subtree},
+// and as {'#': hash} after that. The server mirrors this cache, so the order of lookups and evictions must match
+// the server's: children first, least recently used evicted first.
+export const newContentCache = (capacity: U) => {
+  const
+    contents = new Map<S, any>(),
+    put = (hash: S, x: any) => {
+      contents.delete(hash)
+      contents.set(hash, x)
+      if (contents.size > capacity) contents.delete(contents.keys().next().value)
+    },
+    get = (hash: S): any => {
+      if (!contents.has(hash)) throw new Error(`unknown content ${hash}`)
+      const x = contents.get(hash)
+      contents.delete(hash)
+      contents.set(hash, x)
+      return x
+    },
+    resolveSubtree = (x: any, box: B, items: S, options: S): any => {
+      if (isRef(x)) {
+        const hash: S = x['#']
+        if (!('=' in x)) return clone(get(hash))
+        const y = resolveSubtree(x['='], box, items, options)
+        put(hash, y)
+        return clone(y)
+      }
+      if (box && isO(x)) {
+        const children = x[items]
+        if (Array.isArray(children)) x[items] = children.map(c => resolveSubtree(c, true, items, options))
+        if (x[options] !== undefined) x[options] = resolveSubtree(x[options], false, items, options)
+      }
+      return x
+    },
+    resolve = (x: any, compact: B): any => compact
+      ? resolveSubtree(x, true, itemsCode, optionsCode)
+      : resolveSubtree(x, true, 'items', 'options'),
+    clear = () => contents.clear()
+
+  return { resolve, clear }
+}
+
+export type ContentCache = ReturnType<typeof newContentCache>
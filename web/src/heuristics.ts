@@ -12,12 +12,14 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
-import { anyD, anyN, Incr, isB, isN, isO, isPair, isS, isV, words, xid } from './core';
+import { anyD, anyN, B, Incr, isB, isN, isO, isPair, isS, isV, S, words, xid } from './core';
 import { markdown } from './markdown';
-import { Box, BoxMode, Option } from './protocol';
+import { Box, BoxMode, Option, OptionColumns, OptionSourceRef } from './protocol';
 
 const determineMode = (box: Box): BoxMode => {
-  const { options, editable, multiple } = box
+  const { options, editable, multiple, source } = box
+
+  if (source) return multiple ? 'tag' : 'menu'
 
   if (options.length) {
     if (editable) {
@@ -113,8 +115,40 @@ const sanitizeRange = (box: Box) => {
   }
 }
 
+const isOptionColumns = (x: any): x is OptionColumns => isO(x) && Array.isArray(x.value)
+
+const isOptionSourceRef = (x: any): x is OptionSourceRef => isO(x) && isS(x.source) && isN(x.size)
+
+const expandOptions = (columns: OptionColumns): Option[] => {
+  const
+    { value: values, text, name, icon, caption, selected } = columns,
+    options: Option[] = new Array(values.length)
+  for (let i = 0; i < values.length; i++) {
+    const
+      value = values[i],
+      option: Option = { value, text: text?.[i] ?? String(value) }
+    if (name && name[i] !== null) option.name = name[i] as S
+    if (icon && icon[i] !== null) option.icon = icon[i] as S
+    if (caption && caption[i] !== null) option.caption = caption[i] as S
+    if (selected && selected[i] !== null) option.selected = selected[i] as B
+    options[i] = option
+  }
+  return options
+}
+
+const expandOptionsLazily = (box: Box, columns: OptionColumns) => {
+  let options: Option[] | null = null
+  Object.defineProperty(box, 'options', {
+    get: () => options ?? (options = expandOptions(columns)),
+    set: (x: Option[]) => { options = x },
+    enumerable: true,
+    configurable: true,
+  })
+}
+
 export const sanitizeOptions = (x: any): Option[] => { // recursive
   if (!x) return []
+  if (isOptionColumns(x)) return expandOptions(x)
   if (Array.isArray(x)) {
     const c: Option[] = []
     for (const v of x) {
@@ -162,7 +196,14 @@ export const sanitizeBox = (box: Box): Box => {
       box.value = value ? 1 : 0 // TODO ugly: protocol should accept boolean
       if (!box.mode) box.mode = 'check'
     }
-    box.options = sanitizeOptions(options)
+    if (isOptionSourceRef(options)) {
+      box.source = options
+      box.options = []
+    } else if (isOptionColumns(options)) {
+      expandOptionsLazily(box, options)
+    } else {
+      box.options = sanitizeOptions(options)
+    }
     box.index = 0
     sanitizeRange(box)
     if (!box.mode) box.mode = determineMode(box)
@@ -24,10 +24,13 @@ import { loadScheme } from './theme';
 registerIcons({ icons })
 
 
-const root = document.getElementById('nitro')
-const client = newClient(root?.getAttribute('data-endpoint') ?? '/nitro') // TODO document
-loadScheme(client.schemeB())
-ReactDOM.render(<App client={client} />, root);
+// Each element with id 'nitro' or a 'data-nitro' attribute hosts an app.
+// Apps whose element has a 'data-multiplex' attribute share one connection per endpoint.
+document.querySelectorAll('#nitro, [data-nitro]').forEach((root, i) => {
+  const client = newClient(root.getAttribute('data-endpoint') ?? '/nitro', root.hasAttribute('data-multiplex')) // TODO document
+  if (i === 0) loadScheme(client.schemeB())
+  ReactDOM.render(<App client={client} />, root)
+})
 
 // If you want to start measuring performance in your app, pass a function
 // to log results (for example: reportWebVitals(console.log))
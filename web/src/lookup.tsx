@@ -0,0 +1,75 @@
+// Copyright 2022 H2O.ai, Inc.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+import { ActionButton, ComboBox as FComboBox, IComboBox, IComboBoxOption } from '@fluentui/react';
+import React from 'react';
+import { isV, N, S, signal, U } from './core';
+import { BoxProps, make } from './ui';
+
+// A searchable menu whose options are fetched from the server, a page at a time.
+export const Lookup = make(({ context, box }: BoxProps) => {
+  let search = ''
+  const
+    { index, value, text, placeholder, required, error, editable, source } = box,
+    { source: sourceID, size } = source!,
+    itemsB = signal<IComboBoxOption[]>([]),
+    totalB = signal<U>(0),
+    initialValue = isV(value) ? String(value) : undefined,
+    fetch = (offset: U) => {
+      const q = search
+      context.query(sourceID, q, offset, size).then(({ options, total }) => {
+        if (q !== search) return // stale
+        const items = options.map((o): IComboBoxOption => ({ key: o.value, text: o.text ?? String(o.value) }))
+        itemsB(offset ? [...itemsB(), ...items] : items)
+        totalB(total)
+      })
+    },
+    onInputValueChange = (v: S) => {
+      search = v
+      fetch(0)
+    },
+    onChange = (_: React.FormEvent<IComboBox>, option?: IComboBoxOption, _index?: N, value?: S) => {
+      const v = option ? option.key : editable ? value : undefined
+      if (v !== undefined) context.capture(index, v)
+    },
+    onRenderLowerContent = () => {
+      const
+        n = itemsB().length,
+        total = totalB()
+      return n < total
+        ? <ActionButton iconProps={{ iconName: 'More' }} text={`Show more (${n} of ${total})`} onClick={() => fetch(n)} />
+        : null
+    },
+    init = () => fetch(0),
+    render = () => {
+      return (
+        <FComboBox
+          label={text}
+          placeholder={placeholder}
+          options={itemsB()}
+          defaultSelectedKey={initialValue}
+          required={required}
+          errorMessage={error}
+          onChange={onChange}
+          onInputValueChange={onInputValueChange}
+          onRenderLowerContent={onRenderLowerContent}
+          allowFreeform
+          autoComplete='off'
+        />
+      )
+    }
+
+  if (initialValue) context.capture(index, initialValue)
+  return { init, render, itemsB, totalB }
+})
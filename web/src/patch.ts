@@ -0,0 +1,62 @@
+// Copyright 2022 H2O.ai, Inc.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+import { Dict, I, isO } from './core';
+import { Box, MsgType, PatchOp } from './protocol';
+
+export const clone = <T>(x: T): T => JSON.parse(JSON.stringify(x))
+
+const merge = (box: any, fields: Dict<any>): any => {
+  if (!isO(box)) return fields
+  for (const k in fields) {
+    const v = fields[k]
+    if (v === null) {
+      delete box[k]
+    } else {
+      box[k] = v
+    }
+  }
+  return box
+}
+
+const parentOf = (root: Box, path: I[]): any[] => {
+  let box: any = root
+  for (let i = 0; i < path.length - 1; i++) box = box.items[path[i]]
+  return box.items
+}
+
+export const applyPatch = (root: Box, ops: PatchOp[]): Box => {
+  for (const op of ops) {
+    const { p: path } = op
+    if (!path.length) {
+      if (op.t === MsgType.Update) root = op.m ? merge(root, op.d as Dict<any>) : op.d as Box
+      continue
+    }
+    const
+      items = parentOf(root, path),
+      k = path[path.length - 1]
+    switch (op.t) {
+      case MsgType.Insert:
+        items.splice(k, 0, op.d)
+        break
+      case MsgType.Update:
+        items[k] = op.m ? merge(items[k], op.d as Dict<any>) : op.d
+        break
+      case MsgType.Remove:
+        items.splice(k, 1)
+        break
+    }
+  }
+  return root
+}
@@ -23,6 +23,13 @@ export enum MsgType {
   Insert,
   Update,
   Remove,
+  Patch,
+  Deflate,
+  Batch,
+  Query,
+  Result,
+  Leave,
+  Journal,
 }
 
 export type Input = B | S | N | S[] | N[]
@@ -44,15 +51,67 @@ export type Msg = {
   d: Setting
 } | {
   t: MsgType.Insert
-  d: Box
+  d: Box // large subtrees may be sent as content references; see dedupe.ts
   p?: I
 } | {
   t: MsgType.Update
-  d: Box
+  d: Box // large subtrees may be sent as content references; see dedupe.ts
   p?: I
 } | {
   t: MsgType.Remove
   d: Box
+} | {
+  t: MsgType.Patch
+  d: PatchOp[]
+} | {
+  t: MsgType.Deflate
+  d: Uint8Array // raw deflate-compressed message
+} | {
+  t: MsgType.Batch
+  d: Msg[] // applied in order, rendered once
+} | {
+  t: MsgType.Query
+  d: OptionQuery
+} | {
+  t: MsgType.Result
+  d: OptionResult
+} | {
+  t: MsgType.Leave // closes a channel
+} | {
+  t: MsgType.Journal
+  d: S // token to present, with the session id, when rejoining
+}
+
+// Messages on a multiplexed connection carry the id of their channel (one per session).
+export type Envelope = Msg & { c?: U }
+
+export type OptionQuery = {
+  r: U // request id
+  s: S // option source id
+  q: S // search text
+  o: U // offset
+  n: U // limit
+}
+
+export type OptionResult = {
+  r: U // request id
+  o: any // options, to be sanitized
+  n: U // total number of matches
+}
+
+// Paths index into nested items, starting at the root box; [] is the root box itself.
+export type PatchOp = {
+  t: MsgType.Insert
+  p: I[]
+  d: Box | S
+} | {
+  t: MsgType.Update
+  p: I[]
+  d: Box | S
+  m?: B // if set, d holds changed fields only; null = unset
+} | {
+  t: MsgType.Remove
+  p: I[]
 }
 
 export type Theme = {
@@ -68,6 +127,9 @@ export type Setting = {
   menu?: Option[]
   nav?: Option[]
   theme?: Theme
+  schema?: S // wire version, if boxes will be sent in the compact wire format (see wire.ts)
+  session?: S // id to present when rejoining, if the server journals sessions
+  resume?: S // token to present when reconnecting, to reattach to the session if the server still holds it
 }
 
 export type BoxMode = 'none' | 'md' | 'image' | 'button' | 'menu' | 'radio' | 'check' | 'toggle' | 'text' | 'range' | 'number' | 'time' | 'date' | 'day' | 'week' | 'month' | 'tag' | 'color' | 'rating'
@@ -116,6 +178,7 @@ export type Box = {
   required?: B
   password?: B
   editable?: B
+  source?: OptionSourceRef // options are fetched from the server on demand
 }
 
 export type Option = {
@@ -127,3 +190,19 @@ export type Option = {
   selected?: B
   options?: Option[]
 }
+
+// Options held on the server, queried a page at a time.
+export type OptionSourceRef = {
+  source: S
+  size: U // page size
+}
+
+// A flat option list sent as parallel arrays; null = not set for that option.
+export type OptionColumns = {
+  value: V[]
+  text?: Array<S | null>
+  name?: Array<S | null>
+  icon?: Array<S | null>
+  caption?: Array<S | null>
+  selected?: Array<B | null>
+}
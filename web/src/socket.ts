@@ -13,8 +13,8 @@
 // limitations under the License.
 
 import msgpack from '@ygoe/msgpack';
-import { defer, S, U } from "./core";
-import { Msg } from "./protocol";
+import { B, defer, S, U } from "./core";
+import { Envelope, Msg, MsgType } from "./protocol";
 
 export enum SocketEventT {
   Connect,
@@ -55,10 +55,33 @@ const marshal = (data: any): Uint8Array => msgpack.serialize(data)
 
 const unmarshal = (d: Uint8Array): Msg => msgpack.deserialize(d)
 
+const canInflate = (): boolean => {
+  try {
+    new (window as any).DecompressionStream('deflate-raw')
+    return true
+  } catch (e) {
+    return false
+  }
+}
+
+// Content encodings this client can decode; advertised to the server on join.
+export const encodings: S[] = canInflate() ? ['deflate'] : []
+
+const inflate = async (data: Uint8Array): Promise<Uint8Array> => {
+  const stream = new Blob([data]).stream().pipeThrough(new (window as any).DecompressionStream('deflate-raw'))
+  return new Uint8Array(await new Response(stream).arrayBuffer())
+}
+
+const decode = async (data: any): Promise<Msg> => {
+  const message = unmarshal(data)
+  return message.t === MsgType.Deflate ? unmarshal(await inflate(message.d)) : message
+}
+
 export const connect = (address: S, handle: SocketEventHandler): Socket => {
   let
     _socket: WebSocket | null = null,
-    _backoff = 1
+    _backoff = 1,
+    _inbox = Promise.resolve() // decodes are async; chain them to preserve message order
 
   const
     disconnect = () => {
@@ -74,26 +97,30 @@ export const connect = (address: S, handle: SocketEventHandler): Socket => {
         _backoff = 1
       }
       socket.onclose = (e) => {
-        if (e.code === 1013) { // try again later
-          return
-        }
         _socket = null
-        _backoff *= 2
-        if (_backoff > 16) _backoff = 16
+        const retryAfter = e.code === 1013 ? parseInt(e.reason, 10) : NaN // server busy; try again later
+        if (retryAfter > 0) {
+          _backoff = retryAfter
+        } else {
+          _backoff *= 2
+          if (_backoff > 16) _backoff = 16
+        }
         handle({ t: SocketEventT.Disconnect, retry: _backoff })
         window.setTimeout(retry, _backoff * 1000)
       }
       socket.onmessage = (e) => {
         const data = e.data
         if (!data) return
-        try {
-          const message = unmarshal(data)
-          console.log('recv', message) // XXX remove
-          handle({ t: SocketEventT.Message, message })
-        } catch (error) {
-          console.error(error)
-          handle({ t: SocketEventT.Error, error })
-        }
+        _inbox = _inbox.then(async () => {
+          try {
+            const message = await decode(data)
+            console.log('recv', message) // XXX remove
+            handle({ t: SocketEventT.Message, message })
+          } catch (error) {
+            console.error(error)
+            handle({ t: SocketEventT.Error, error })
+          }
+        })
       }
       socket.onerror = (error) => {
         console.error(error)
@@ -111,3 +138,55 @@ export const connect = (address: S, handle: SocketEventHandler): Socket => {
 
   return { send, disconnect }
 }
+
+type Line = {
+  socket: Socket
+  channels: Map<U, SocketEventHandler>
+  next: U
+  connected: B
+}
+
+const lines = new Map<S, Line>()
+
+// Like connect(), but shares one connection per address between all callers, each on its own channel.
+// The server must serve the address with multiplex() instead of serve().
+export const connectChannel = (address: S, handle: SocketEventHandler): Socket => {
+  let line = lines.get(address)
+  if (!line) {
+    const
+      channels = new Map<U, SocketEventHandler>(),
+      newLine: Line = {
+        socket: connect(address, e => {
+          if (e.t === SocketEventT.Message) {
+            const h = channels.get((e.message as Envelope).c ?? 0)
+            if (h) h(e)
+            return
+          }
+          if (e.t === SocketEventT.Connect) newLine.connected = true
+          if (e.t === SocketEventT.Disconnect) newLine.connected = false
+          for (const h of Array.from(channels.values())) h(e)
+        }),
+        channels,
+        next: 1,
+        connected: false,
+      }
+    lines.set(address, line = newLine)
+  }
+  const
+    { socket, channels } = line,
+    c = line.next++,
+    send = (message: Msg) => {
+      if (message) socket.send({ ...message, c })
+    },
+    disconnect = () => {
+      channels.delete(c)
+      socket.send({ t: MsgType.Leave, c })
+      if (!channels.size) {
+        lines.delete(address)
+        socket.disconnect()
+      }
+    }
+  channels.set(c, handle)
+  if (line.connected) defer(0, () => handle(connectEvent)) // joining a line that is already up
+  return { send, disconnect }
+}
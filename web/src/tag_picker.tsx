@@ -22,7 +22,7 @@ import { BoxProps, make } from './ui';
 
 export const TagPicker = make(({ context, box }: BoxProps) => {
   const
-    { index, text, options } = box,
+    { index, text, options, source } = box,
     selectedOptions = selectedsOf(box),
     selectedKeys = selectedOptions.map(o => String(o.value)),
     tags: ITag[] = options.map(o => ({ key: o.value, name: String(o.text) })),
@@ -31,12 +31,18 @@ export const TagPicker = make(({ context, box }: BoxProps) => {
     listContainsTagList = (tag: ITag, tagList?: ITag[]) => (!tagList || !tagList.length || tagList.length === 0)
       ? false
       : tagList.some(compareTag => compareTag.key === tag.key),
-    suggest = (filterText: string, tagList?: ITag[]): ITag[] =>
-      filterText
-        ? tags.filter(tag => tag.name.toLowerCase().includes(filterText.toLowerCase()) && !listContainsTagList(tag, tagList))
-        : [],
+    lookup = (filterText: string, tagList?: ITag[]): PromiseLike<ITag[]> =>
+      context.query(source!.source, filterText, 0, source!.size).then(({ options }) => options
+        .map(o => ({ key: o.value, name: String(o.text) }))
+        .filter(tag => !listContainsTagList(tag, tagList))),
+    suggest = (filterText: string, tagList?: ITag[]): ITag[] | PromiseLike<ITag[]> =>
+      source
+        ? lookup(filterText, tagList)
+        : filterText
+          ? tags.filter(tag => tag.name.toLowerCase().includes(filterText.toLowerCase()) && !listContainsTagList(tag, tagList))
+          : [],
     resolve = (item: ITag) => item.name,
-    whenEmpty = () => tags,
+    whenEmpty = (tagList?: ITag[]) => source ? lookup('', tagList) : tags,
     onChange = (tags?: ITag[]) => {
       if (tags) capture(tags)
     },
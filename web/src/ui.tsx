@@ -13,16 +13,34 @@
 // limitations under the License.
 
 import React from 'react';
-import { B, Dict, Disposable, isSignal, on, V } from './core';
-import { Box, Input, MsgType } from './protocol';
+import { B, Dict, Disposable, isSignal, on, S, U, V } from './core';
+import { sanitizeOptions } from './heuristics';
+import { Box, Input, MsgType, Option, OptionResult } from './protocol';
 import { Send } from './socket';
 
+export type OptionPage = { options: Option[], total: U }
+
+let _queryID = 0
+const pendingQueries: Dict<(page: OptionPage) => void> = {}
+
+export const resolveQuery = ({ r, o, n }: OptionResult) => {
+  const resolve = pendingQueries[r]
+  if (!resolve) return
+  delete pendingQueries[r]
+  resolve({ options: sanitizeOptions(o), total: n })
+}
+
 export const newCaptureContext = (send: Send, data: Array<Input | null>) => {
   const capture = <T extends Input | null>(index: any, value: T) => {
     if (index >= 0) data[index] = value
   }
   const submit = () => send({ t: MsgType.Input, d: data })
-  return { capture, submit }
+  const query = (source: S, search: S, offset: U, limit: U) => new Promise<OptionPage>(resolve => {
+    const r = ++_queryID
+    pendingQueries[r] = resolve
+    send({ t: MsgType.Query, d: { r, s: source, q: search, o: offset, n: limit } })
+  })
+  return { capture, submit, query }
 }
 
 export type Context = ReturnType<typeof newCaptureContext>
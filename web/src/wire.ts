@@ -0,0 +1,81 @@
+// Generated by py/make_wire.py from protocol.ts. Do not edit.
+
+export const wireVersion = '479e28fb'
+
+export const boxFields = [
+  'xid',
+  'index',
+  'text',
+  'name',
+  'mode',
+  'value',
+  'options',
+  'items',
+  'row',
+  'tile',
+  'cross_tile',
+  'wrap',
+  'gap',
+  'align',
+  'width',
+  'height',
+  'margin',
+  'padding',
+  'border',
+  'color',
+  'background',
+  'image',
+  'fit',
+  'grow',
+  'shrink',
+  'basis',
+  'icon',
+  'min',
+  'max',
+  'step',
+  'precision',
+  'range',
+  'mask',
+  'prefix',
+  'suffix',
+  'placeholder',
+  'error',
+  'lines',
+  'multiple',
+  'required',
+  'password',
+  'editable',
+  'source',
+]
+
+export const optionFields = [
+  'value',
+  'text',
+  'name',
+  'icon',
+  'caption',
+  'selected',
+  'options',
+]
+
+export const boxModes = [
+  'none',
+  'md',
+  'image',
+  'button',
+  'menu',
+  'radio',
+  'check',
+  'toggle',
+  'text',
+  'range',
+  'number',
+  'time',
+  'date',
+  'day',
+  'week',
+  'month',
+  'tag',
+  'color',
+  'rating',
+]